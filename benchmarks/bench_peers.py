@@ -0,0 +1,100 @@
+"""
+Scaling of the peer-school search: KD-tree vs exhaustive blocked distances.
+
+    python benchmarks/bench_peers.py --sizes 1000 4000 16000 64000
+
+Feature vectors are drawn like the real ones (rates driven by one shared
+school-quality factor, a log-normal cohort size, some metrics missing).
+For every size both searches run on the same matrix, their results are
+checked to be identical, and the growth exponent between consecutive sizes
+is reported: 2 for all-pairs work, close to 1 for the tree.
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+import synthetic  # noqa: F401  (puts the repo root on sys.path)
+
+import peers  # noqa: E402
+
+
+def feature_matrix(n, missing, rng):
+    quality = rng.normal(size=n)
+    noise = rng.normal(size=(n, 4))
+    matrix = np.column_stack([
+        60 + 15 * quality + 8 * noise[:, 0],      # ready grad
+        55 + 12 * quality + 8 * noise[:, 1],      # college going
+        19 + 2.5 * quality + 1.2 * noise[:, 2],   # ACT
+        88 + 5 * quality + 4 * noise[:, 3],       # graduation
+        np.log1p(rng.lognormal(5, 0.8, size=n)),  # cohort
+    ])
+    # College-going and ACT are the metrics schools most often lack
+    for col in (1, 2):
+        matrix[rng.random(n) < missing, col] = np.nan
+    return np.round(matrix, 1)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def exponent(sizes, times, i):
+    if i == 0 or times[i] is None or times[i - 1] is None:
+        return None
+    return math.log(times[i] / times[i - 1]) / math.log(sizes[i] / sizes[i - 1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark peer search scaling')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000, 16000, 32000])
+    parser.add_argument('--k', type=int, default=peers.DEFAULT_K)
+    parser.add_argument('--missing', type=float, default=0.1, help='Share of schools missing each optional metric')
+    parser.add_argument('--max-blocked', type=int, default=16000,
+                        help='Largest size to also run the exhaustive search on')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the measurements to this JSON file')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    sizes = sorted(args.sizes)
+    results = []
+    for n in sizes:
+        matrix = peers.standardize(feature_matrix(n, args.missing, rng))
+        tree, tree_s = timed(lambda: peers.nearest_peers(matrix, args.k))
+        row = {'schools': n, 'patterns': tree[2], 'tree_s': round(tree_s, 3), 'blocked_s': None, 'identical': None}
+        if n <= args.max_blocked:
+            blocked, blocked_s = timed(lambda: peers.nearest_peers(matrix, args.k, search=peers.blocked_neighbors))
+            row['blocked_s'] = round(blocked_s, 3)
+            row['identical'] = bool(np.array_equal(tree[0], blocked[0]) and
+                                    np.allclose(tree[1], blocked[1], equal_nan=True))
+        results.append(row)
+
+    print(f"\n{'schools':>9}{'tree s':>10}{'growth':>8}{'blocked s':>12}{'growth':>8}{'speedup':>9}  identical")
+    for i, row in enumerate(results):
+        tree_growth = exponent(sizes, [r['tree_s'] for r in results], i)
+        blocked_growth = exponent(sizes, [r['blocked_s'] for r in results], i)
+        blocked = '' if row['blocked_s'] is None else f"{row['blocked_s']:.3f}"
+        speedup = '' if row['blocked_s'] is None else f"{row['blocked_s'] / row['tree_s']:.1f}x"
+        print(f"{row['schools']:>9}{row['tree_s']:>10.3f}"
+              f"{'' if tree_growth is None else f'n^{tree_growth:.2f}':>8}"
+              f"{blocked:>12}{'' if blocked_growth is None else f'n^{blocked_growth:.2f}':>8}"
+              f"{speedup:>9}  {'' if row['identical'] is None else row['identical']}")
+        row['tree_growth'] = tree_growth
+        row['blocked_growth'] = blocked_growth
+
+    if len(results) > 1:
+        overall = math.log(results[-1]['tree_s'] / results[0]['tree_s']) / math.log(sizes[-1] / sizes[0])
+        print(f"\n  tree: time grows as n^{overall:.2f} from {sizes[0]} to {sizes[-1]} schools")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'k': args.k, 'missing': args.missing, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
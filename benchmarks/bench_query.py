@@ -0,0 +1,80 @@
+"""
+Query latency of query.SchoolIndex against the linear scans it replaces.
+
+    python benchmarks/bench_query.py --data tennessee-after-graduation-data.json
+
+Reports the cold time (first call, which builds the index it needs) and
+the warm per-call time of each query.
+"""
+import argparse
+import os
+import time
+import timeit
+
+import synthetic
+
+from query import SchoolIndex  # noqa: E402  (importable via synthetic's sys.path)
+
+DEFAULT_DATA = os.path.join(synthetic.ROOT, 'tennessee-after-graduation-data.json')
+
+
+def queries(index):
+    schools = index.schools
+    sample = schools[len(schools) // 2]
+    county = sample['county']
+    return [
+        ('get by slug',
+         lambda: index.get(sample['slug']),
+         lambda: next(s for s in schools if s['slug'] == sample['slug'])),
+        ('get by codes',
+         lambda: index.by_code(sample['system_code'], sample['school_code']),
+         lambda: next(s for s in schools if (s['system_code'], s['school_code']) ==
+                      (sample['system_code'], sample['school_code']))),
+        ('county schools',
+         lambda: index.county(county),
+         lambda: [s for s in schools if s['county'] == county]),
+        ('top 5 flight score',
+         lambda: index.top('flight_score', 5),
+         lambda: sorted([s for s in schools if s['flight_score'] is not None],
+                        key=lambda x: x['flight_score'], reverse=True)[:5]),
+        ('top 5 in county',
+         lambda: index.top('flight_score', 5, county=county),
+         lambda: sorted([s for s in schools if s['county'] == county and s['flight_score'] is not None],
+                        key=lambda x: x['flight_score'], reverse=True)[:5]),
+        ('ACT 21-24 range',
+         lambda: index.range('act_composite', 21, 24),
+         lambda: [s for s in schools if s['latest']['act_composite'] is not None
+                  and 21 <= s['latest']['act_composite'] <= 24]),
+        ('tier + 2 ranges',
+         lambda: index.filter(tier='strong', ready_grad_rate=(50, None), graduation_rate=(90, None)),
+         lambda: [s for s in schools if s['flight_tier_class'] == 'tier-strong'
+                  and (s['latest']['ready_grad_rate'] or 0) >= 50 and (s['latest']['graduation_rate'] or 0) >= 90]),
+    ]
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark indexed queries against linear scans')
+    parser.add_argument('--data', default=DEFAULT_DATA)
+    parser.add_argument('--number', type=int, default=200, help='Calls per timing run')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = SchoolIndex.load(args.data)
+    print(f"Loaded {len(index)} schools in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"\n{'query':<22}{'cold ms':>10}{'indexed us':>13}{'linear us':>12}{'speedup':>10}")
+    for name, indexed, linear in queries(index):
+        start = time.perf_counter()
+        indexed()
+        cold = (time.perf_counter() - start) * 1000
+        fast = per_call_us(indexed, args.number)
+        slow = per_call_us(linear, args.number)
+        print(f"{name:<22}{cold:>10.3f}{fast:>13.1f}{slow:>12.1f}{slow / fast:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
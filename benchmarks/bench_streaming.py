@@ -0,0 +1,96 @@
+"""
+Peak memory of the pandas loader vs the streaming loader.
+
+Every workbook of a synthetic dataset is parsed once per reader, each in a
+fresh interpreter, and the growth of peak RSS over the post-import baseline
+is reported along with the parse time:
+
+    python benchmarks/bench_streaming.py --scale 10 --groups 12
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import run_benchmarks
+import synthetic  # noqa: F401  (puts the repo root on sys.path)
+
+import build_mega_json_v3 as build  # noqa: E402  (importable via synthetic's sys.path)
+
+READERS = ['pandas', 'streaming']
+
+
+def measure(reader, path, loader_name, sheet_name, warmup):
+    """Runs in the child process"""
+    import instrument
+    import ingest
+    import sheet_cache
+
+    cache = sheet_cache.SheetCache(enabled=False, streaming=reader == 'streaming')
+    loader = getattr(ingest, loader_name)
+    # Parse a small sheet first so lazily imported reader modules aren't counted
+    cache.load(warmup, ingest.load_cgr, build.CGR_SHEET)
+    baseline = instrument.peak_rss_mb()
+    start = time.perf_counter()
+    frame = cache.load(path, loader, sheet_name)
+    return {
+        'seconds': round(time.perf_counter() - start, 3),
+        'rows': len(frame),
+        'baseline_mb': baseline,
+        'peak_mb': instrument.peak_rss_mb(),
+    }
+
+
+def run_child(reader, path, loader_name, sheet_name, warmup):
+    args = [sys.executable, os.path.abspath(__file__), '--child', reader, path, loader_name,
+            json.dumps(sheet_name), warmup]
+    return json.loads(subprocess.check_output(args, text=True))
+
+
+def workbooks(input_dir):
+    for metric, files, loader, _ in build.SOURCES:
+        for parts, year in files:
+            yield f"{metric} {year}", os.path.join(input_dir, *parts), loader.__name__, 0
+    yield 'college_going', os.path.join(input_dir, *build.CGR_FILE), 'load_cgr', build.CGR_SHEET
+
+
+def main(argv=None):
+    if argv is None and sys.argv[1:2] == ['--child']:
+        reader, path, loader_name, sheet_name, warmup = sys.argv[2:7]
+        print(json.dumps(measure(reader, path, loader_name, json.loads(sheet_name), warmup)))
+        return
+
+    parser = argparse.ArgumentParser(description='Compare peak RSS of the pandas and streaming workbook readers')
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--groups', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the measurements to this JSON file')
+    args = parser.parse_args(argv)
+
+    input_dir = run_benchmarks.dataset(args.scale, args.groups, args.seed)
+    warmup = os.path.join(input_dir, *build.CGR_FILE)
+
+    print(f"\n{'workbook':<22}{'MB on disk':>11}" + ''.join(f"{r + ' +RSS MB':>18}{'s':>8}" for r in READERS))
+    results = []
+    for label, path, loader_name, sheet_name in workbooks(input_dir):
+        row = {'workbook': label, 'bytes': os.path.getsize(path)}
+        for reader in READERS:
+            row[reader] = run_child(reader, path, loader_name, sheet_name, warmup)
+        results.append(row)
+        print(f"{label:<22}{row['bytes'] / 1e6:>11.1f}" + ''.join(
+            f"{row[r]['peak_mb'] - row[r]['baseline_mb']:>18.1f}{row[r]['seconds']:>8.2f}" for r in READERS))
+
+    for reader in READERS:
+        worst = max(row[reader]['peak_mb'] - row[reader]['baseline_mb'] for row in results)
+        total = sum(row[reader]['seconds'] for row in results)
+        print(f"\n  {reader}: worst peak RSS growth {worst:.1f} MB, {total:.2f}s total")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scale': args.scale, 'groups': args.groups, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
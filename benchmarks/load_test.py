@@ -0,0 +1,159 @@
+"""
+Load test for server.py: requests per second and latency percentiles.
+
+    python benchmarks/load_test.py --data tennessee-after-graduation-data.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --connections 64 --duration 10
+
+Without --url the server is started in-process on a free port. Each
+connection is a keep-alive asyncio client cycling through a mix of school,
+county, tier, improver and query paths; --revalidate makes a share of the
+requests conditional on the ETag seen last time (304s).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import synthetic
+
+import server  # noqa: E402  (importable via synthetic's sys.path)
+import shards  # noqa: E402
+from query import METRICS  # noqa: E402
+
+DEFAULT_DATA = os.path.join(synthetic.ROOT, 'tennessee-after-graduation-data.json')
+
+
+def request_paths(data, seed=0):
+    """Weighted mix of paths: mostly single schools, then listings and queries"""
+    rng = random.Random(seed)
+    schools = data['schools']
+    counties = sorted({s['county'] for s in schools})
+    paths = []
+    paths += [f"/api/schools/{shard}" for shard in rng.sample(shards.shard_ids(schools), min(200, len(schools)))]
+    paths += [f"/api/counties/{shards.file_slug(c)}" for c in rng.sample(counties, min(40, len(counties)))]
+    paths += [f"/api/tiers/{tier}" for tier in server.TIER_KEYS]
+    paths += ['/api/improvers', '/api/state', '/api/counties']
+    paths += [f"/api/top?metric={rng.choice(METRICS)}&k={rng.choice([5, 10, 25])}&county={c}"
+              for c in rng.sample(counties, min(30, len(counties)))]
+    paths += [f"/api/filter?tier={rng.choice(server.TIER_KEYS)}&min_graduation_rate={rng.choice([80, 90, 95])}"
+              for _ in range(20)]
+    return [p.replace(' ', '%20') for p in paths]
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('server closed the connection')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers
+
+
+async def client(host, port, paths, deadline, revalidate, encoding, seed, latencies, statuses):
+    rng = random.Random(seed)
+    etags = {}
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            lines = [f"GET {path} HTTP/1.1", f"Host: {host}"]
+            if encoding:
+                lines.append(f"Accept-Encoding: {encoding}")
+            if path in etags and rng.random() < revalidate:
+                lines.append(f"If-None-Match: {etags[path]}")
+            start = time.perf_counter()
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            status, headers = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if 'etag' in headers:
+                etags[path] = headers['etag']
+    finally:
+        writer.close()
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run(args):
+    app = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        with open(args.data) as f:
+            data = json.load(f)
+    else:
+        start = time.perf_counter()
+        app = server.DatasetApp.load(args.data)
+        data = app.index.data
+        print(f"Server startup (load + precompute {len(app.routes)} responses): "
+              f"{time.perf_counter() - start:.2f}s")
+        srv = await server.start_server(app, '127.0.0.1', 0)
+        host, port = srv.sockets[0].getsockname()[:2]
+
+    paths = request_paths(data, args.seed)
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(client(host, port, paths, deadline, args.revalidate, args.encoding,
+                                  args.seed + i, latencies, statuses) for i in range(args.connections)))
+    elapsed = time.perf_counter() - started
+    if app is not None:
+        srv.close()
+        await srv.wait_closed()
+
+    ordered = sorted(latencies)
+    result = {
+        'connections': args.connections,
+        'requests': len(ordered),
+        'rps': round(len(ordered) / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+    }
+    if app is not None:
+        result['cache'] = {'hits': app.cache.hits, 'misses': app.cache.misses, 'size': len(app.cache.items)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure requests/s and latency of server.py')
+    parser.add_argument('--data', default=DEFAULT_DATA, help='Built dataset (used for the path mix)')
+    parser.add_argument('--url', help='Test a running server instead of starting one in-process')
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds')
+    parser.add_argument('--revalidate', type=float, default=0.3,
+                        help='Share of repeat requests sent with If-None-Match')
+    parser.add_argument('--encoding', default='gzip, br', help="Accept-Encoding header ('' for none)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the result to this JSON file')
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print(f"\n{result['requests']} requests over {args.connections} connections in {args.duration:.0f}s")
+    print(f"   {result['rps']:.0f} req/s   p50 {result['p50_ms']:.2f} ms   p95 {result['p95_ms']:.2f} ms   "
+          f"p99 {result['p99_ms']:.2f} ms   max {result['max_ms']:.2f} ms")
+    print(f"   statuses: {result['statuses']}")
+    if 'cache' in result:
+        print(f"   query cache: {result['cache']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark suite for build_mega_json_v3.py.
+
+For each scale, synthetic workbooks are generated once (benchmarks/.data),
+then the build is run as a subprocess in each mode and its build_report.json
+per-stage timings are collected:
+
+    cold         --no-cache: every workbook parsed from .xlsx
+    cached       warm sheet cache
+    incremental  --incremental against the previous build's state
+
+Every run is appended to benchmarks/results.jsonl, and each stage is
+compared against the last stored run of the same scale, mode and job count,
+so slowdowns show up run to run:
+
+    python benchmarks/run_benchmarks.py --scales 1 10 --repeat 3
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import synthetic
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUILD_SCRIPT = os.path.join(synthetic.ROOT, 'build_mega_json_v3.py')
+DATA_DIR = os.path.join(HERE, '.data')
+RESULTS_FILE = os.path.join(HERE, 'results.jsonl')
+MODES = ['cold', 'cached', 'incremental']
+
+# A stage regressed if it got this much slower, by at least MIN_SECONDS
+THRESHOLD = 0.25
+MIN_SECONDS = 0.05
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=synthetic.ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset(scale, groups, seed):
+    """Input folder for one scale, generated on first use"""
+    path = os.path.join(DATA_DIR, f"scale-{scale}-groups-{groups}-seed-{seed}")
+    if not os.path.exists(os.path.join(path, '.complete')):
+        print(f"\n[*] Generating {scale}x workbooks ({groups} groups)...")
+        shutil.rmtree(path, ignore_errors=True)
+        synthetic.generate(path, scale, groups, seed)
+        open(os.path.join(path, '.complete'), 'w').close()
+    return path
+
+
+def run_build(input_dir, work_dir, mode, jobs):
+    """One build in `mode`; returns its build report"""
+    report = os.path.join(work_dir, 'build_report.json')
+    args = [sys.executable, BUILD_SCRIPT, '--input-dir', input_dir,
+            '--output', os.path.join(work_dir, 'out.json'), '--report', report, '--jobs', str(jobs),
+            '--cache-dir', os.path.join(work_dir, 'cache'), '--state-dir', os.path.join(work_dir, 'state'),
+            '--snapshot-dir', os.path.join(work_dir, 'snapshots')]
+    if mode == 'cold':
+        args.append('--no-cache')
+    elif mode == 'incremental':
+        args.append('--incremental')
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+    with open(report) as f:
+        return json.load(f)
+
+
+def best_of(reports):
+    """Per-stage minimum over repeats (the least noisy estimate)"""
+    stages = {}
+    for name in reports[0]['stages']:
+        runs = [r['stages'][name] for r in reports if name in r['stages']]
+        stages[name] = {
+            'wall_s': min(s['wall_s'] for s in runs),
+            'cpu_s': min(s['cpu_s'] for s in runs),
+            'rss_delta_mb': max(s['rss_delta_mb'] or 0 for s in runs),
+            'peak_rss_growth_mb': max(s['peak_rss_growth_mb'] or 0 for s in runs),
+        }
+    return {
+        'wall_s': min(r['total']['wall_s'] for r in reports),
+        'cpu_s': min(r['total']['cpu_s'] for r in reports),
+        'peak_rss_mb': max(r['total']['peak_rss_mb'] or 0 for r in reports),
+        'counters': reports[0]['total']['counters'],
+        'stages': stages,
+    }
+
+
+def benchmark(scale, groups, seed, modes, jobs, repeat):
+    input_dir = dataset(scale, groups, seed)
+    work_dir = tempfile.mkdtemp(prefix='tnfirefly-bench-')
+    results = []
+    try:
+        # Prime the sheet cache and build state the cached/incremental modes rely on
+        run_build(input_dir, work_dir, 'cached', jobs)
+        for mode in modes:
+            print(f"   {scale}x {mode}...")
+            reports = [run_build(input_dir, work_dir, mode, jobs) for _ in range(repeat)]
+            results.append({'scale': scale, 'groups': groups, 'mode': mode, 'jobs': jobs, **best_of(reports)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history, result):
+    for old in reversed(history):
+        if all(old.get(k) == result[k] for k in ('scale', 'groups', 'mode', 'jobs')):
+            return old
+    return None
+
+
+def regressions(old, new):
+    """[(stage, old wall, new wall)] for stages that slowed down past the threshold"""
+    found = []
+    for name, stats in [('total', new)] + list(new['stages'].items()):
+        before = old if name == 'total' else old['stages'].get(name)
+        if before is None:
+            continue
+        if stats['wall_s'] - before['wall_s'] >= MIN_SECONDS and stats['wall_s'] > before['wall_s'] * (1 + THRESHOLD):
+            found.append((name, before['wall_s'], stats['wall_s']))
+    return found
+
+
+def print_result(result, old):
+    print(f"\n{result['scale']}x {result['mode']} ({result['jobs']} jobs): {result['wall_s']:.2f}s wall, "
+          f"{result['cpu_s']:.2f}s CPU, {result['peak_rss_mb']:.0f} MB peak RSS")
+    stages = sorted(result['stages'].items(), key=lambda item: item[1]['wall_s'], reverse=True)
+    for name, stats in stages[:6]:
+        before = old['stages'].get(name) if old else None
+        change = f"{(stats['wall_s'] / before['wall_s'] - 1) * 100:+6.0f}%" if before and before['wall_s'] else ''
+        print(f"  {name:<28}{stats['wall_s']:>8.3f}s {change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every build stage on synthetic workbooks')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10],
+                        help='Multiples of the Tennessee school count (e.g. 1 10 100 1000)')
+    parser.add_argument('--groups', type=int, default=3, help='Student groups per school')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per mode; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--results', default=RESULTS_FILE, help='JSON-lines history to compare against and append to')
+    parser.add_argument('--no-save', action='store_true', help="Compare, but don't append this run")
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 1 if any stage regressed')
+    args = parser.parse_args(argv)
+
+    history = load_results(args.results)
+    run = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+    }
+
+    print("=" * 60)
+    print("BUILD BENCHMARKS")
+    print("=" * 60)
+
+    results = []
+    for scale in args.scales:
+        results += benchmark(scale, args.groups, args.seed, args.modes, args.jobs, args.repeat)
+
+    regressed = []
+    for result in results:
+        old = previous_run(history, result)
+        print_result(result, old)
+        if old:
+            for name, before, after in regressions(old, result):
+                regressed.append(name)
+                print(f"  REGRESSION {name}: {before:.3f}s -> {after:.3f}s (vs {old['commit']} {old['timestamp']})")
+
+    if not args.no_save:
+        with open(args.results, 'a') as f:
+            for result in results:
+                f.write(json.dumps({**run, **result}) + '\n')
+        print(f"\nAppended {len(results)} results to {args.results}")
+
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
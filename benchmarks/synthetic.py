@@ -0,0 +1,176 @@
+"""
+Synthetic TDOE workbooks with the real column layouts, for benchmarking
+without the source files.
+
+Writes the graduation, ready graduate, ACT and CGR workbooks at the paths
+build_mega_json_v3.py reads, under one input folder:
+
+    python benchmarks/synthetic.py bench-data --scale 10 --groups 12
+
+Schools come from the published after-graduation file. `--scale N` repeats
+them as N "states" with distinct district codes and names, `--groups` sets
+how many student groups each school has (the build keeps 'All Students'),
+and a share of cells carry the suppression markers TDOE uses.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import build_mega_json_v3 as build  # noqa: E402
+
+SCHOOLS_FILE = os.path.join(ROOT, 'tennessee-after-graduation-data.json')
+
+STUDENT_GROUPS = [
+    'All Students', 'Economically Disadvantaged', 'Students with Disabilities', 'English Learners',
+    'Black or African American', 'Hispanic', 'White', 'Asian', 'Native American', 'Female', 'Male',
+    'Black/Hispanic/Native American', 'Non-Economically Disadvantaged', 'Non-English Learners',
+    'Non-Students with Disabilities', 'Homeless', 'Military', 'Foster', 'Migrant', 'Gifted',
+]
+SUPPRESSION_MARKERS = ['*', '**', '<5', '>95', '-']
+
+GRAD_COLUMNS = ['system', 'system_name', 'school', 'school_name', 'student_group',
+                'grad_cohort_state', 'grad_count_state', 'grad_rate_state']
+# The 2022-23 graduation file predates the _state cohort column
+GRAD_COLUMNS_2023 = [c.replace('grad_cohort_state', 'grad_cohort') for c in GRAD_COLUMNS]
+RG_COLUMNS = ['system', 'system_name', 'school', 'school_name', 'student_group',
+              'n_count', 'n_ready_grad', 'pct_ready_grad']
+ACT_COLUMNS = ['District', 'District Name', 'School', 'School Name', 'Subgroup',
+               'Average Composite Score', 'Average English Score', 'Average Math Score',
+               'Average Reading Score', 'Average Science Score', 'Percent Scoring 21 or Higher',
+               'Percent Scoring Below 19', 'Valid Tests']
+CGR_COLUMNS = ['HS_District', 'HS_County', 'High_School', 'ACT_Code'] + [f'Class of {yr} CGR' for yr in range(2019, 2024)]
+
+
+def base_schools():
+    with open(SCHOOLS_FILE) as f:
+        return [
+            {key: s[key] for key in ('system_code', 'district', 'school_code', 'school', 'county')}
+            for s in json.load(f)['schools']
+        ]
+
+
+def scaled_schools(scale):
+    """`scale` copies of the base schools, each copy with its own district codes and names"""
+    schools = []
+    for state in range(scale):
+        for s in base_schools():
+            copy = dict(s)
+            if state:
+                copy['system_code'] = s['system_code'] + 1000 * state
+                copy['district'] = f"{s['district']} {state + 1}"
+            schools.append(copy)
+    return schools
+
+
+class Generator:
+    def __init__(self, schools, groups, seed=0, suppression=0.06, missing=0.03):
+        self.schools = schools
+        self.groups = STUDENT_GROUPS[:max(1, groups)]
+        self.rng = random.Random(seed)
+        self.suppression = suppression
+        self.missing = missing
+
+    def suppressed(self, value):
+        if self.rng.random() < self.suppression:
+            return self.rng.choice(SUPPRESSION_MARKERS)
+        return value
+
+    def rate(self, low, high):
+        return self.suppressed(round(self.rng.uniform(low, high), 1))
+
+    def count(self, low, high):
+        return self.suppressed(self.rng.randint(low, high))
+
+    def listed(self):
+        """Schools in one year's file; a few drop out of any given year"""
+        return [s for s in self.schools if self.rng.random() >= self.missing]
+
+    def grad_rows(self):
+        for s in self.listed():
+            for group in self.groups:
+                yield [s['system_code'], s['district'], s['school_code'], s['school'], group,
+                       self.count(5, 600), self.count(5, 550), self.rate(55, 100)]
+
+    def ready_grad_rows(self):
+        for s in self.listed():
+            for group in self.groups:
+                yield [s['system_code'], s['district'], s['school_code'], s['school'], group,
+                       self.count(5, 600), self.count(1, 400), self.rate(5, 95)]
+
+    def act_rows(self):
+        for s in self.listed():
+            for group in self.groups:
+                yield ([s['system_code'], s['district'], s['school_code'], s['school'], group] +
+                       [self.rate(14, 27) for _ in range(5)] +
+                       [self.rate(0, 80), self.rate(10, 90), self.count(5, 500)])
+
+    def cgr_rows(self):
+        for s in self.schools:
+            if self.rng.random() < 0.2:
+                continue
+            # Upper-case names and HS abbreviations, as in the real sheet
+            name = s['school'].upper() if self.rng.random() < 0.5 else s['school']
+            if self.rng.random() < 0.1:
+                name = name.replace('High School', 'HS').replace('HIGH SCHOOL', 'HS')
+            rates = [self.suppressed(round(self.rng.uniform(0.2, 0.9), 3)) for _ in range(5)]
+            yield [s['district'].upper(), (s['county'] or 'Unknown').upper() + ' ', name,
+                   430000 + self.rng.randint(0, 9999)] + rates
+
+
+def write_sheet(path, columns, rows, sheet_name='Sheet1', extra_sheets=()):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wb = Workbook(write_only=True)
+    for name in extra_sheets:
+        wb.create_sheet(name).append(['Notes'])
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+    n = 0
+    for row in rows:
+        ws.append(row)
+        n += 1
+    wb.save(path)
+    return n
+
+
+def generate(output_dir, scale=1, groups=3, seed=0):
+    """Write every source workbook under output_dir; returns {path: data rows}"""
+    gen = Generator(scaled_schools(scale), groups, seed)
+    written = {}
+
+    def path(parts):
+        return os.path.join(output_dir, *parts)
+
+    for parts, year in build.GRAD_FILES:
+        columns = GRAD_COLUMNS_2023 if year == '2023' else GRAD_COLUMNS
+        written[path(parts)] = write_sheet(path(parts), columns, gen.grad_rows())
+    for parts, _ in build.RG_FILES:
+        written[path(parts)] = write_sheet(path(parts), RG_COLUMNS, gen.ready_grad_rows())
+    for parts, _ in build.ACT_FILES:
+        written[path(parts)] = write_sheet(path(parts), ACT_COLUMNS, gen.act_rows())
+    written[path(build.CGR_FILE)] = write_sheet(path(build.CGR_FILE), CGR_COLUMNS, gen.cgr_rows(),
+                                                sheet_name=build.CGR_SHEET, extra_sheets=['Notes'])
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic TDOE workbooks')
+    parser.add_argument('output_dir', help='Input folder to create (pass it to --input-dir)')
+    parser.add_argument('--scale', type=int, default=1, help='Copies of the ~400 Tennessee schools')
+    parser.add_argument('--groups', type=int, default=3, help=f'Student groups per school (max {len(STUDENT_GROUPS)})')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    written = generate(args.output_dir, args.scale, args.groups, args.seed)
+    for path, rows in written.items():
+        print(f"  {rows:>9,} rows  {os.path.relpath(path, args.output_dir)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,32 @@
-import pandas as pd
+import argparse
 import json
+import os
 import re
+import sys
+import time
+from operator import itemgetter
 
-def safe_float(val):
-    try:
-        if isinstance(val, str):
-            if '*' in val or '<' in val or '-' == val.strip():
-                return None
-        return round(float(val), 1)
-    except:
-        return None
-
-def safe_int(val):
-    try:
-        return int(val)
-    except:
-        return None
+import numpy as np
+import pandas as pd
 
-def safe_pct(val):
-    """Convert decimal to percentage if needed"""
-    f = safe_float(val)
-    if f is not None and f <= 1:
-        return round(f * 100, 1)
-    return f
+import datasets
+import delta
+import flight_engine
+import incremental
+import ingest
+import instrument
+import peers
+import ranking
+import search
+import shards
+import sheet_cache
+import snapshots
+from flight_engine import FlightScoreEngine
+from pipeline import Pipeline
+from query import SchoolIndex
+from school_cube import SchoolCube
+from school_matcher import SchoolMatcher
+from sheet_cache import SheetCache
 
 def create_slug(name):
     """Create URL-friendly slug from school name"""
@@ -32,16 +36,12 @@ def create_slug(name):
     slug = re.sub(r'-+', '-', slug)
     return slug.strip('-')
 
-def calculate_trend(school_obj):
-    """Calculate trend info based on Ready Grad 2-year change"""
-    rg_data = school_obj.get('ready_grad', {})
-    rg_2023 = rg_data.get('2023', {}).get('rate') if rg_data.get('2023') else None
-    rg_2025 = rg_data.get('2025', {}).get('rate') if rg_data.get('2025') else None
-    
-    if rg_2023 is None or rg_2025 is None:
+def calculate_trend(change):
+    """Calculate trend info from the Ready Grad 2-year change (None if either year is missing)"""
+    if change is None:
         return {'direction': 'none', 'change': None, 'arrow': ''}
     
-    change = round(rg_2025 - rg_2023, 1)
+    change = round(change, 1)
     
     if change >= 5:
         return {'direction': 'up', 'change': change, 'arrow': 'up'}
@@ -50,70 +50,6 @@ def calculate_trend(school_obj):
     else:
         return {'direction': 'stable', 'change': change, 'arrow': 'stable'}
 
-def calculate_flight_score(school):
-    """
-    TNFirefly Flight Score (0-100)
-    """
-    latest = school.get('latest', {})
-    
-    ready_grad = latest.get('ready_grad_rate')
-    college_going = latest.get('college_going_rate')
-    act = latest.get('act_composite')
-    graduation = latest.get('graduation_rate')
-    
-    valid_metrics = sum([
-        ready_grad is not None,
-        college_going is not None,
-        act is not None,
-        graduation is not None
-    ])
-    
-    if valid_metrics < 2:
-        return None
-    
-    score = 0
-    total_weight = 0
-    
-    if ready_grad is not None:
-        score += ready_grad * 0.40
-        total_weight += 0.40
-    
-    if college_going is not None:
-        score += college_going * 0.25
-        total_weight += 0.25
-    
-    if act is not None:
-        act_normalized = min(100, max(0, (act - 10) * (100 / 26)))
-        score += act_normalized * 0.20
-        total_weight += 0.20
-    
-    if graduation is not None:
-        score += graduation * 0.15
-        total_weight += 0.15
-    
-    if total_weight > 0:
-        score = score / total_weight
-    else:
-        return None
-    
-    # Momentum Bonus
-    rg_data = school.get('ready_grad', {})
-    rg_2023 = rg_data.get('2023', {}).get('rate') if rg_data.get('2023') else None
-    rg_2025 = rg_data.get('2025', {}).get('rate') if rg_data.get('2025') else None
-    
-    if rg_2023 is not None and rg_2025 is not None:
-        change = rg_2025 - rg_2023
-        if change >= 10:
-            score += 5
-        elif change >= 5:
-            score += 3
-        elif change <= -10:
-            score -= 5
-        elif change <= -5:
-            score -= 3
-    
-    return round(max(0, min(100, score)), 1)
-
 def get_flight_tier(score):
     if score is None:
         return {'tier': 'Insufficient Data', 'class': 'tier-na'}
@@ -127,397 +63,699 @@ def get_flight_tier(score):
         return {'tier': 'Building Momentum', 'class': 'tier-building'}
     return {'tier': 'Room to Grow', 'class': 'tier-grow'}
 
-print("=" * 60)
-print("BUILDING MEGA DATASET v3 - WITH TRENDS & COUNTY RANKINGS")
-print("=" * 60)
-
-schools = {}
-county_map = {}
-
-# ========== 1. GRADUATION DATA ==========
-print("\n[1/4] Loading Graduation Rates...")
-grad_files = [
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Graduation Cohort Data\2022-23_school_grad_rate_suppressed.xlsx', '2023'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Graduation Cohort Data\2023-24_school_grad_rate_suppressed.xlsx', '2024'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Graduation Cohort Data\2024-25_school_grad_rate_suppressed.xlsx', '2025'),
+# ========== SOURCE FILES (relative to --input-dir) ==========
+GRAD_FILES = [
+    (('Graduation Cohort Data', '2022-23_school_grad_rate_suppressed.xlsx'), '2023'),
+    (('Graduation Cohort Data', '2023-24_school_grad_rate_suppressed.xlsx'), '2024'),
+    (('Graduation Cohort Data', '2024-25_school_grad_rate_suppressed.xlsx'), '2025'),
 ]
+RG_FILES = [
+    (('Ready Graduate', 'ready_graduate_school_suppressed_22-23.xlsx'), '2023'),
+    (('Ready Graduate', 'ready_graduate_school_suppressed_2024.xlsx'), '2024'),
+    (('Ready Graduate', 'ready_graduate_school_suppressed_2025.xlsx'), '2025'),
+]
+ACT_FILES = [
+    (('ACT Data', 'ACT Data School Level', '2022-23_ACT_school_suppressed.xlsx'), '2023'),
+    (('ACT Data', 'ACT Data School Level', '2023-24_ACT_school_suppressed.xlsx'), '2024'),
+    (('ACT Data', 'ACT Data School Level', '2024-25_ACT_school_suppressed.xlsx'), '2025'),
+]
+CGR_FILE = ('College Data', 'CGR by HS_Suppressed (1).xlsx')
+CGR_SHEET = '5-Year CGR'
 
-for filepath, year in grad_files:
-    df = pd.read_excel(filepath)
-    df = df[df['student_group'] == 'All Students']
-    for _, row in df.iterrows():
-        key = f"{int(row['system'])}-{int(row['school'])}"
-        if key not in schools:
-            schools[key] = {
-                'system_code': int(row['system']),
-                'district': row['system_name'],
-                'school_code': int(row['school']),
-                'school': row['school_name'],
-                'county': None,
-                'graduation': {},
-                'ready_grad': {},
-                'college_going': {},
-                'act': {}
-            }
-        cohort_col = 'grad_cohort_state' if 'grad_cohort_state' in row.index else 'grad_cohort'
-        schools[key]['graduation'][year] = {
-            'rate': safe_float(row['grad_rate_state']),
-            'cohort': safe_int(row[cohort_col])
-        }
-
-print(f"   Loaded {len(schools)} schools")
-
-# ========== 2. READY GRADUATE DATA ==========
-print("\n[2/4] Loading Ready Graduate Rates...")
-rg_files = [
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Ready Graduate\ready_graduate_school_suppressed_22-23.xlsx', '2023'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Ready Graduate\ready_graduate_school_suppressed_2024.xlsx', '2024'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\Ready Graduate\ready_graduate_school_suppressed_2025.xlsx', '2025'),
+SOURCES = [
+    ('graduation', GRAD_FILES, ingest.load_graduation, list(ingest.GRAD_FIELDS)),
+    ('ready_grad', RG_FILES, ingest.load_ready_grad, list(ingest.READY_GRAD_FIELDS)),
+    ('act', ACT_FILES, ingest.load_act, list(ingest.ACT_FIELDS)),
 ]
 
-for filepath, year in rg_files:
-    df = pd.read_excel(filepath)
-    df = df[df['student_group'] == 'All Students']
-    for _, row in df.iterrows():
-        key = f"{int(row['system'])}-{int(row['school'])}"
-        if key not in schools:
-            schools[key] = {
-                'system_code': int(row['system']),
-                'district': row['system_name'],
-                'school_code': int(row['school']),
-                'school': row['school_name'],
-                'county': None,
-                'graduation': {},
-                'ready_grad': {},
-                'college_going': {},
-                'act': {}
-            }
-        schools[key]['ready_grad'][year] = {
-            'rate': safe_float(row['pct_ready_grad']),
-            'count': safe_int(row['n_count'])
-        }
+DEFAULT_OUTPUT = 'tennessee-after-graduation-data.json'
 
-print(f"   Added Ready Graduate data")
 
-# ========== 3. ACT DATA ==========
-print("\n[3/4] Loading ACT Scores...")
-act_files = [
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\ACT Data\ACT Data School Level\2022-23_ACT_school_suppressed.xlsx', '2023'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\ACT Data\ACT Data School Level\2023-24_ACT_school_suppressed.xlsx', '2024'),
-    (r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\ACT Data\ACT Data School Level\2024-25_ACT_school_suppressed.xlsx', '2025'),
-]
+# ========== MERGE ==========
+def group_frame(split, group, fields=()):
+    """One student group's rows of a loaded file, empty if the file doesn't list the group"""
+    if group in split:
+        return split[group]
+    return pd.DataFrame(columns=['key'] + ingest.NAME_FIELDS + list(fields))
 
-for filepath, year in act_files:
-    df = pd.read_excel(filepath)
-    df = df[df['Subgroup'] == 'All Students']
-    for _, row in df.iterrows():
-        key = f"{int(row['District'])}-{int(row['School'])}"
-        if key not in schools:
-            schools[key] = {
-                'system_code': int(row['District']),
-                'district': row['District Name'],
-                'school_code': int(row['School']),
-                'school': row['School Name'],
-                'county': None,
-                'graduation': {},
-                'ready_grad': {},
-                'college_going': {},
-                'act': {}
-            }
-        schools[key]['act'][year] = {
-            'composite': safe_float(row['Average Composite Score']),
-            'english': safe_float(row['Average English Score']),
-            'math': safe_float(row['Average Math Score']),
-            'reading': safe_float(row['Average Reading Score']),
-            'science': safe_float(row['Average Science Score']),
-            'pct_21_plus': safe_float(row['Percent Scoring 21 or Higher']),
-            'tested': safe_int(row['Valid Tests'])
-        }
 
-print(f"   Added ACT data")
+def group_metrics(by_metric, group):
+    """{metric: widened per-year frames} for one student group"""
+    return {
+        metric: ingest.widen([(group_frame(split, group, fields), year) for split, year in by_metric[metric]], fields)
+        for metric, _, _, fields in SOURCES
+    }
 
-# ========== 4. COLLEGE-GOING RATE DATA ==========
-print("\n[4/4] Loading College-Going Rates...")
-cgr_df = pd.read_excel(
-    r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\College Data\CGR by HS_Suppressed (1).xlsx',
-    sheet_name='5-Year CGR'
-)
 
-for _, row in cgr_df.iterrows():
-    district = str(row['HS_District']).strip().upper()
-    county = str(row['HS_County']).strip().upper()
-    if district and county and district != 'NAN':
-        county_map[district] = county
+MATCH_KINDS = ('exact', 'fuzzy', 'statewide', 'unmatched', 'ambiguous')
 
-for _, row in cgr_df.iterrows():
-    school_name = str(row['High_School']).strip().upper()
-    district_name = str(row['HS_District']).strip().upper()
-    
-    if school_name == 'NAN' or district_name == 'NAN':
-        continue
-    
-    for key, school in schools.items():
-        school_name_clean = str(school['school']).strip().upper() if school['school'] else ''
-        district_name_clean = str(school['district']).strip().upper() if school['district'] else ''
-        if (school_name_clean == school_name and district_name_clean == district_name):
-            for yr in ['2019', '2020', '2021', '2022', '2023']:
-                col = f'Class of {yr} CGR'
-                if col in row:
-                    rate = safe_pct(row[col])
-                    if rate is not None:
-                        school['college_going'][yr] = {'rate': rate}
-            school['county'] = row['HS_County'].strip().title()
-            break
 
-print(f"   Matched CGR data")
+def merge_sources(loads, cgr, *frames):
+    """
+    Join the loaded workbooks on school key.
+    `loads` lists (metric, year) for each frame, in load order.
+    """
+    print("\n[*] Merging workbooks...")
+    groups = [ingest.split_groups(frame) for frame in frames]
+    by_metric = {metric: [] for metric, _, _, _ in SOURCES}
+    for (metric, year), split in zip(loads, groups):
+        by_metric[metric].append((split, year))
+
+    frames = [group_frame(split, ingest.ALL_STUDENTS) for split in groups]
+    directory = ingest.build_directory(frames)
+    print(f"   {len(directory)} schools across {len(frames)} workbooks")
+
+    matcher = SchoolMatcher(directory.to_dict('index'))
+    matched = ingest.match_cgr(cgr, matcher)
+    cgr_wide, cgr_info = ingest.cgr_by_school(matched)
+
+    match_report = matcher.report()
+    print(f"   Matched CGR data: {match_report['exact']} exact, {match_report['fuzzy']} fuzzy, "
+          f"{match_report['statewide']} by name statewide, {match_report['unmatched']} unmatched, "
+          f"{match_report['ambiguous']} ambiguous")
+    instrument.count(schools=len(directory), cgr_rows=len(cgr),
+                     **{f"matched_{kind}": match_report[kind] for kind in MATCH_KINDS})
+    for row in match_report['ambiguous_rows'][:5]:
+        print(f"   [ambiguous] {row['school']} ({row['district']}): {', '.join(row['candidates'])}")
+    for district, rows in list(match_report['unknown_districts'].items())[:5]:
+        print(f"   [unknown district] {district}: {rows} unmatched rows")
+
+    metrics = group_metrics(by_metric, ingest.ALL_STUDENTS)
+    metrics['college_going'] = cgr_wide
+
+    return {
+        'directory': directory,
+        'metrics': metrics,
+        'by_metric': by_metric,
+        'groups': list(dict.fromkeys([ingest.ALL_STUDENTS] + [group for split in groups for group in split])),
+        'cgr_info': cgr_info,
+        'cgr': matched,
+        'county_map': ingest.county_map(cgr),
+        'match_report': match_report
+    }
+
 
 # ========== ASSIGN COUNTIES ==========
-print("\n[*] Assigning counties...")
-for key, school in schools.items():
-    if not school['county']:
-        district_str = str(school['district']) if school['district'] else ''
-        district_upper = district_str.strip().upper()
-        if district_upper in county_map:
-            school['county'] = county_map[district_upper].title()
-        elif 'COUNTY' in district_upper:
-            parts = district_upper.split('COUNTY')[0].strip()
-            school['county'] = parts.title()
+def assign_counties(merged):
+    print("\n[*] Assigning counties...")
+    directory = ingest.assign_counties(merged['directory'], merged['cgr_info']['county'], merged['county_map'])
+    return SchoolCube.from_frames(directory, merged['metrics'])
+
 
 # ========== CALCULATE STATE AVERAGES ==========
-print("\n[*] Calculating state averages...")
-state_stats = {
-    'graduation': {'2023': [], '2024': [], '2025': []},
-    'ready_grad': {'2023': [], '2024': [], '2025': []},
-    'college_going': {'2019': [], '2020': [], '2021': [], '2022': [], '2023': []},
-    'act': {'2023': [], '2024': [], '2025': []}
-}
+def calculate_state_averages(cube):
+    print("\n[*] Calculating state averages...")
+    stats = incremental.RunningAverages()
+    stats.add(cube)
+    return stats
 
-for school in schools.values():
-    for year, data in school['graduation'].items():
-        if data['rate'] is not None:
-            state_stats['graduation'][year].append(data['rate'])
-    for year, data in school['ready_grad'].items():
-        if data['rate'] is not None:
-            state_stats['ready_grad'][year].append(data['rate'])
-    for year, data in school['college_going'].items():
-        if data['rate'] is not None:
-            state_stats['college_going'][year].append(data['rate'])
-    for year, data in school['act'].items():
-        if data['composite'] is not None:
-            state_stats['act'][year].append(data['composite'])
-
-state_averages = {}
-for metric, years in state_stats.items():
-    state_averages[metric] = {}
-    for year, values in years.items():
-        if values:
-            state_averages[metric][year] = round(sum(values) / len(values), 1)
 
 # ========== BUILD FINAL SCHOOLS LIST ==========
-print("\n[*] Building final school list...")
+# Years searched for each `latest` value, oldest first (SchoolCube.latest takes the last non-null)
+LATEST = {
+    'graduation_rate': ('graduation', 'rate', ['2023', '2024', '2025']),
+    'ready_grad_rate': ('ready_grad', 'rate', ['2023', '2024', '2025']),
+    'college_going_rate': ('college_going', 'rate', ['2022', '2023']),
+    'act_composite': ('act', 'composite', ['2023', '2024', '2025']),
+}
 
-final_schools = []
-flight_scores = []
 
-for key, school in schools.items():
-    has_2025_grad = school['graduation'].get('2025', {}).get('rate') is not None
-    has_2025_rg = school['ready_grad'].get('2025', {}).get('rate') is not None
-    
-    if has_2025_grad or has_2025_rg:
-        latest_grad = school['graduation'].get('2025', {}).get('rate') or \
-                      school['graduation'].get('2024', {}).get('rate') or \
-                      school['graduation'].get('2023', {}).get('rate')
-        latest_rg = school['ready_grad'].get('2025', {}).get('rate') or \
-                    school['ready_grad'].get('2024', {}).get('rate') or \
-                    school['ready_grad'].get('2023', {}).get('rate')
-        latest_cgr = school['college_going'].get('2023', {}).get('rate') or \
-                     school['college_going'].get('2022', {}).get('rate')
-        latest_act = school['act'].get('2025', {}).get('composite') or \
-                     school['act'].get('2024', {}).get('composite') or \
-                     school['act'].get('2023', {}).get('composite')
-        
+# Per-year fields published for each metric in the after-graduation file
+SCHOOL_FIELDS = {
+    'graduation': ['rate', 'cohort'],
+    'ready_grad': ['rate', 'count'],
+    'college_going': ['rate'],
+    'act': ['composite', 'english', 'math', 'reading', 'science', 'pct_21_plus', 'tested'],
+}
+
+
+def _value(v):
+    return None if v != v else v
+
+
+def build_school_objs(cube, rows=None):
+    """
+    key -> scored school object for the cube rows (all if None) that make
+    the final list, i.e. have a 2025 grad or ready grad rate
+    """
+    eligible = ~np.isnan(cube.get('graduation', 'rate', '2025')) | ~np.isnan(cube.get('ready_grad', 'rate', '2025'))
+    if rows is not None:
+        selected = np.zeros(len(cube), dtype=bool)
+        selected[rows] = True
+        eligible &= selected
+    rows = np.flatnonzero(eligible)
+
+    latest = {name: cube.latest(metric, field, years)[rows] for name, (metric, field, years) in LATEST.items()}
+    rg_change = cube.delta('ready_grad', 'rate', '2023', '2025')[rows]
+
+    # Calculate Flight Scores
+    flight_scores = FlightScoreEngine(
+        latest['ready_grad_rate'], latest['college_going_rate'],
+        latest['act_composite'], latest['graduation_rate'], rg_change
+    ).scores()
+
+    latest = {name: values.tolist() for name, values in latest.items()}
+    rg_change = rg_change.tolist()
+    districts = cube.names('district')[rows]
+    names = cube.names('school')[rows]
+    counties = cube.names('county')[rows]
+    records = cube.records(rows, SCHOOL_FIELDS)
+
+    final = {}
+    for i, row in enumerate(rows):
+        record = records[i]
         school_obj = {
-            'school': school['school'],
-            'district': school['district'],
-            'county': school['county'] or 'Unknown',
-            'system_code': school['system_code'],
-            'school_code': school['school_code'],
-            'slug': create_slug(school['school']),
-            'latest': {
-                'graduation_rate': latest_grad,
-                'ready_grad_rate': latest_rg,
-                'college_going_rate': latest_cgr,
-                'act_composite': latest_act
-            },
-            'graduation': school['graduation'],
-            'ready_grad': school['ready_grad'],
-            'college_going': school['college_going'],
-            'act': school['act']
+            'school': names[i],
+            'district': districts[i],
+            'county': counties[i] or 'Unknown',
+            'system_code': int(cube.system_codes[row]),
+            'school_code': int(cube.school_codes[row]),
+            'slug': create_slug(names[i]),
+            'latest': {name: _value(values[i]) for name, values in latest.items()},
+            'graduation': record['graduation'],
+            'ready_grad': record['ready_grad'],
+            'college_going': record['college_going'],
+            'act': record['act']
         }
         
-        # Calculate Flight Score
-        flight_score = calculate_flight_score(school_obj)
+        flight_score = flight_scores[i]
         tier_info = get_flight_tier(flight_score)
-        trend_info = calculate_trend(school_obj)
+        trend_info = calculate_trend(_value(rg_change[i]))
         
         school_obj['flight_score'] = flight_score
         school_obj['flight_tier'] = tier_info['tier']
         school_obj['flight_tier_class'] = tier_info['class']
         school_obj['trend'] = trend_info
-        
-        if flight_score is not None:
-            flight_scores.append(flight_score)
-        
-        final_schools.append(school_obj)
-
-# Sort by school name
-final_schools.sort(key=lambda x: x['school'])
-
-print(f"   Final count: {len(final_schools)} schools")
-
-# ========== CALCULATE COUNTY RANKINGS ==========
-print("\n[*] Calculating county rankings...")
-
-# Group schools by county
-county_schools = {}
-for school in final_schools:
-    county = school['county']
-    if county not in county_schools:
-        county_schools[county] = []
-    county_schools[county].append(school)
-
-# Rank within each county and mark top 3
-for county, schools_list in county_schools.items():
-    # Sort by flight score (descending)
-    ranked = sorted(
-        [s for s in schools_list if s['flight_score'] is not None],
-        key=lambda x: x['flight_score'],
-        reverse=True
-    )
-    
-    for i, school in enumerate(ranked):
-        school['county_rank'] = i + 1
-        school['county_total'] = len(ranked)
-        school['is_top_county'] = (i < 3)  # Top 3 get the firefly badge!
-
-# Handle schools without flight scores
-for school in final_schools:
-    if 'county_rank' not in school:
-        school['county_rank'] = None
-        school['county_total'] = None
-        school['is_top_county'] = False
-
-# ========== FIND BIGGEST IMPROVERS ==========
-print("\n[*] Finding biggest improvers...")
-
-improvers = []
-for school in final_schools:
-    if school['trend']['change'] is not None and school['trend']['change'] > 0:
-        improvers.append({
-            'school': school['school'],
-            'slug': school['slug'],
-            'county': school['county'],
-            'district': school['district'],
-            'change': school['trend']['change'],
-            'flight_score': school['flight_score'],
-            'flight_tier': school['flight_tier'],
-            'rg_2023': school['ready_grad'].get('2023', {}).get('rate'),
-            'rg_2025': school['ready_grad'].get('2025', {}).get('rate')
-        })
+        final[cube.keys[row]] = school_obj
+
+    return final
+
+
+def score_schools(cube):
+    """key -> scored school object, for every school that makes the final list"""
+    print("\n[*] Building final school list...")
+    final = build_school_objs(cube)
+    instrument.count(schools_scored=len(final))
+    print(f"   Final count: {len(final)} schools")
+    return final
+
+
+def sorted_schools(final):
+    # Sort by school name
+    return sorted(final.values(), key=lambda x: x['school'])
+
+
+# ========== CALCULATE RANKINGS ==========
+def rank_all(final):
+    """
+    County ranks (in the school objects), the district / state rank and
+    percentile table, improvers, flight score stats and leaderboards
+    """
+    return ranking.rank(sorted_schools(final))
+
+
+def rank_schools(final):
+    print("\n[*] Calculating rankings...")
+    print("\n[*] Finding biggest improvers...")
+    return rank_all(final)
+
+
+# ========== INCREMENTAL UPDATE ==========
+def update_incrementally(previous, cube):
+    """
+    Redo scoring and state averages only for the schools whose merged
+    inputs differ from the previous build's, then re-rank.
+    """
+    print("\n[*] Updating previous build incrementally...")
+    old_cube = previous['cube']
+    added, removed, changed = cube.diff(old_cube)
+
+    touched = {}
+    for fields in changed.values():
+        for field in fields:
+            touched[field] = touched.get(field, 0) + 1
+    instrument.count(added=len(added), removed=len(removed), changed=len(changed))
+    print(f"   {len(added)} added, {len(removed)} removed, {len(changed)} changed schools")
+    for field, count in touched.items():
+        print(f"   {field}: {count} schools")
+
+    stats = previous['averages']
+    final = dict(previous['final'])
+
+    old_rows = np.array([old_cube.key_index[key] for key in removed + list(changed)], dtype=np.int64)
+    stats.remove(old_cube, old_rows)
+    for key in removed + list(changed):
+        final.pop(key, None)
+
+    new_rows = np.array([cube.key_index[key] for key in added + list(changed)], dtype=np.int64)
+    stats.add(cube, new_rows)
+    final.update(build_school_objs(cube, new_rows))
+
+    # Keep the full build's insertion order so ties sort the same way
+    final = {key: final[key] for key in cube.keys if key in final}
+
+    # State ranks and percentiles move with any change, and re-ranking is
+    # one vectorized pass, so every school is re-ranked (only county ranks
+    # land in the school records, so only that county's hashes change)
+    print("\n[*] Calculating rankings...")
+    return {'stats': stats, 'final': final, 'ranked': rank_all(final)}
+
+
+def verify_incremental(cube, output, ranked):
+    """
+    Rebuild from scratch and check the incremental output (and rank table)
+    would be written byte-identical. Runs before anything is written and
+    exits on a mismatch; otherwise returns the output for the writing stages.
+    """
+    print("\n[*] Verifying incremental output against a full rebuild...")
+    full_ranked = rank_schools(score_schools(cube))
+    full = build_output(calculate_state_averages(cube), full_ranked)
+
+    if json.dumps(output, indent=2) == json.dumps(full, indent=2) and ranked['rankings'] == full_ranked['rankings']:
+        print("   OK: incremental output is identical to a full rebuild")
+        return output
+
+    print("   MISMATCH: incremental output differs from a full rebuild")
+    for ours, theirs in zip(output['schools'], full['schools']):
+        if ours != theirs:
+            print(f"   first differing school: {theirs['slug']}")
+            break
+    sys.exit("   Nothing was written and the previous build state was kept")
 
-# Sort by improvement amount
-improvers.sort(key=lambda x: x['change'], reverse=True)
-top_improvers = improvers[:15]  # Top 15 improvers
-
-# ========== FLIGHT SCORE STATS ==========
-if flight_scores:
-    avg_flight = round(sum(flight_scores) / len(flight_scores), 1)
-    max_flight = round(max(flight_scores), 1)
-    min_flight = round(min(flight_scores), 1)
-else:
-    avg_flight = max_flight = min_flight = None
-
-tier_counts = {
-    'elite': len([s for s in final_schools if s['flight_tier'] == 'Firefly Elite']),
-    'strong': len([s for s in final_schools if s['flight_tier'] == 'Firefly Strong']),
-    'ready': len([s for s in final_schools if s['flight_tier'] == 'Firefly Ready']),
-    'building': len([s for s in final_schools if s['flight_tier'] == 'Building Momentum']),
-    'grow': len([s for s in final_schools if s['flight_tier'] == 'Room to Grow']),
-    'na': len([s for s in final_schools if s['flight_tier'] == 'Insufficient Data'])
-}
 
 # ========== BUILD OUTPUT JSON ==========
-output = {
-    'meta': {
-        'title': 'What Happens After Graduation - Tennessee High School Outcomes',
-        'description': 'Comprehensive data on graduation rates, college readiness, college enrollment, and ACT scores for Tennessee high schools',
-        'source': 'Tennessee Department of Education',
-        'updated': '2025-01',
-        'version': '3.0',
-        'metrics': {
-            'graduation': 'Percentage of students who graduate within 4 years',
-            'ready_grad': 'Percentage meeting Ready Graduate criteria (ACT 21+, industry cert, military, etc.)',
-            'college_going': 'Percentage enrolled in postsecondary education within 1 year',
-            'act': 'Average ACT composite score'
-        },
-        'flight_score': {
-            'name': 'TNFirefly Flight Score',
-            'description': 'Proprietary score measuring how well a school prepares students for life after graduation',
-            'formula': {
-                'ready_grad_weight': 0.40,
-                'college_going_weight': 0.25,
-                'act_weight': 0.20,
-                'graduation_weight': 0.15,
-                'momentum_bonus': '+/- 5 points based on 2-year Ready Grad trend'
+def build_output(stats, ranked):
+    final_schools = ranked['schools']
+    return {
+        'meta': {
+            'title': 'What Happens After Graduation - Tennessee High School Outcomes',
+            'description': 'Comprehensive data on graduation rates, college readiness, college enrollment, and ACT scores for Tennessee high schools',
+            'source': 'Tennessee Department of Education',
+            'updated': '2025-01',
+            'version': '3.0',
+            'metrics': {
+                'graduation': 'Percentage of students who graduate within 4 years',
+                'ready_grad': 'Percentage meeting Ready Graduate criteria (ACT 21+, industry cert, military, etc.)',
+                'college_going': 'Percentage enrolled in postsecondary education within 1 year',
+                'act': 'Average ACT composite score'
             },
-            'tiers': {
-                'elite': {'min': 85, 'label': 'Firefly Elite'},
-                'strong': {'min': 70, 'label': 'Firefly Strong'},
-                'ready': {'min': 55, 'label': 'Firefly Ready'},
-                'building': {'min': 40, 'label': 'Building Momentum'},
-                'grow': {'min': 0, 'label': 'Room to Grow'}
+            'flight_score': {
+                'name': 'TNFirefly Flight Score',
+                'description': 'Proprietary score measuring how well a school prepares students for life after graduation',
+                'formula': {
+                    **{f"{metric}_weight": weight for metric, weight in zip(flight_engine.METRICS, flight_engine.DEFAULT_WEIGHTS)},
+                    'momentum_bonus': '+/- 5 points based on 2-year Ready Grad trend'
+                },
+                'tiers': {
+                    'elite': {'min': 85, 'label': 'Firefly Elite'},
+                    'strong': {'min': 70, 'label': 'Firefly Strong'},
+                    'ready': {'min': 55, 'label': 'Firefly Ready'},
+                    'building': {'min': 40, 'label': 'Building Momentum'},
+                    'grow': {'min': 0, 'label': 'Room to Grow'}
+                }
             }
-        }
-    },
-    'state': {
-        'schools_count': len(final_schools),
-        'counties_count': len(set(s['county'] for s in final_schools)),
-        'averages': state_averages,
-        'flight_score': {
-            'average': avg_flight,
-            'max': max_flight,
-            'min': min_flight,
-            'tier_counts': tier_counts
-        }
-    },
-    'top_improvers': top_improvers,
-    'schools': final_schools
-}
+        },
+        'state': {
+            'schools_count': len(final_schools),
+            'counties_count': len(set(s['county'] for s in final_schools)),
+            'averages': stats.averages(),
+            'flight_score': ranked['flight_score']
+        },
+        'top_improvers': ranked['top_improvers'],
+        'leaderboards': ranked['leaderboards'],
+        'schools': delta.with_hashes(final_schools)
+    }
+
+
+def write_output(output_path, output):
+    with open(output_path, 'w') as f:
+        json.dump(output, f, indent=2)
+    return output_path
+
+
+# ========== DELTA MANIFEST ==========
+def read_previous_output(output_path):
+    """The currently published output, read before this build overwrites it"""
+    if not os.path.exists(output_path):
+        return None
+    try:
+        with open(output_path) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def write_delta(delta_path, previous, output):
+    print("\n[*] Writing delta manifest...")
+    manifest = delta.build_manifest(previous, output)
+    with open(delta_path, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    print(f"   {len(manifest['added'])} added, {len(manifest['removed'])} removed, "
+          f"{len(manifest['changed'])} changed -> {delta_path}")
+    return manifest
+
+
+# ========== SNAPSHOT HISTORY ==========
+def write_snapshot(snapshot_dir, output):
+    """Append this build to the snapshot store"""
+    print("\n[*] Appending build snapshot...")
+    store = snapshots.SnapshotStore(snapshot_dir)
+    entry = store.append(output)
+    if entry is None:
+        print(f"   Unchanged since {store.builds()[-1]['build']}, nothing appended")
+        return None
+    instrument.count(snapshot_rows=entry['schools'], snapshot_bytes=entry['bytes'])
+    print(f"   build {entry['build']}: {entry['schools']} schools, {entry['bytes']:,} bytes "
+          f"({len(store.builds())} builds in {snapshot_dir})")
+    return entry
+
+
+# ========== PUBLISHED DATASETS ==========
+def write_datasets(output_dir, cube, merged):
+    """The per-metric dataset files, from the same cube as the main output"""
+    print("\n[*] Writing published datasets...")
+    written = datasets.write_datasets(output_dir, cube, merged['cgr'])
+    for path, count in written.items():
+        print(f"   {path}: {count} schools")
+    return written
+
+
+# ========== SHARDED OUTPUT ==========
+def write_shards(shards_dir, output_path, output):
+    """Index + per-county / per-school shards of the output, for lazy loading"""
+    print("\n[*] Writing sharded output...")
+    result = shards.write_shards(shards_dir, output)
+    sizes = result['bytes']
+    index_raw, index_gz = sizes[shards.INDEX_FILE]
+    school_gz = sorted(gz for path, (_, gz) in sizes.items() if path.startswith('schools/'))
+    print(f"   {result['files']} files in {shards_dir} ({result['written']} written, {result['removed']} removed)")
+    print(f"   index.json: {index_raw:,} bytes, {index_gz:,} gzipped "
+          f"(monolithic file: {os.path.getsize(output_path):,} bytes)")
+    if school_gz:
+        print(f"   school shard median: {school_gz[len(school_gz) // 2]:,} bytes gzipped")
+    return result
+
+
+# ========== SEARCH INDEX ==========
+def write_search_index(search_path, output):
+    """Autocomplete index over school, district and county names"""
+    print("\n[*] Writing search index...")
+    start = time.perf_counter()
+    index = search.build_index(output['schools'])
+    build_ms = (time.perf_counter() - start) * 1000
+    _, raw, gz = shards.write_compressed(search_path, index)
+    instrument.count(search_tokens=len(index['tokens']), search_trigrams=len(index['trigrams']),
+                     search_bytes=raw, search_gz_bytes=gz)
+    print(f"   {len(index['tokens'])} words, {len(index['trigrams'])} trigrams, built in {build_ms:.1f} ms")
+    print(f"   {search_path}: {raw:,} bytes, {gz:,} gzipped")
+    return search_path
+
+
+# ========== PEER SCHOOLS ==========
+def write_peers(peers_path, output):
+    """The closest schools by metric profile, for every school"""
+    print("\n[*] Finding peer schools...")
+    result = peers.build_peers(output['schools'])
+    _, raw, gz = shards.write_compressed(peers_path, result)
+    with_peers = sum(1 for found in result['schools'].values() if found)
+    instrument.count(schools_with_peers=with_peers, peer_patterns=result['patterns'])
+    print(f"   {with_peers} of {len(result['schools'])} schools have peers "
+          f"({result['patterns']} missing-metric patterns)")
+    print(f"   {peers_path}: {raw:,} bytes, {gz:,} gzipped")
+    return peers_path
+
+
+# ========== RANKINGS TABLE ==========
+def write_rankings(rankings_path, ranked):
+    """District / state ranks and percentiles, kept out of the school records"""
+    print("\n[*] Writing rankings table...")
+    table = {'fields': ['district_rank', 'district_total', 'state_rank', 'state_total', 'percentiles'],
+             'schools': ranked['rankings']}
+    _, raw, gz = shards.write_compressed(rankings_path, table)
+    print(f"   {rankings_path}: {len(table['schools'])} schools, {raw:,} bytes, {gz:,} gzipped")
+    return rankings_path
+
+
+# ========== STUDENT GROUPS ==========
+def score_group(directory, merged, group):
+    """Scored, county-ranked output for one student group (None if no school lists it)"""
+    metrics = group_metrics(merged['by_metric'], group)
+    # College-going rates are only published for all students
+    metrics['college_going'] = merged['metrics']['college_going'].iloc[:0]
+    cube = SchoolCube.from_frames(directory, metrics)
+
+    final = build_school_objs(cube)
+    if not final:
+        return None
+    stats = incremental.RunningAverages()
+    stats.add(cube)
+    ranked = rank_all(final)
+
+    schools = [{k: v for k, v in school.items() if k != 'college_going'} for school in ranked['schools']]
+    return {
+        'group': group,
+        'state': {
+            'schools_count': len(schools),
+            'counties_count': len(set(s['county'] for s in schools)),
+            'averages': {metric: years for metric, years in stats.averages().items() if metric != 'college_going'},
+            'flight_score': ranked['flight_score']
+        },
+        'top_improvers': ranked['top_improvers'],
+        'schools': schools
+    }
+
 
-# Save
-output_path = r'C:\Users\gardn\OneDrive\Desktop\TDOE Data\tennessee-after-graduation-data.json'
-with open(output_path, 'w') as f:
-    json.dump(output, f, indent=2)
-
-print(f"\n{'=' * 60}")
-print(f"SUCCESS! Saved to: {output_path}")
-print(f"{'=' * 60}")
-print(f"\nSUMMARY:")
-print(f"  Total Schools: {len(final_schools)}")
-print(f"  Counties: {len(set(s['county'] for s in final_schools))}")
-print(f"  Avg Flight Score: {avg_flight}")
-print(f"\nTOP 5 IMPROVERS (Ready Grad 2-year change):")
-for i, imp in enumerate(top_improvers[:5], 1):
-    print(f"  {i}. {imp['school']} - +{imp['change']}% (now {imp['rg_2025']}%)")
-
-print(f"\nTOP 5 SCHOOLS BY FLIGHT SCORE:")
-top_5 = sorted([s for s in final_schools if s['flight_score']], key=lambda x: x['flight_score'], reverse=True)[:5]
-for i, s in enumerate(top_5, 1):
-    print(f"  {i}. {s['school']} - {s['flight_score']} ({s['county']})")
-
-print(f"\nSAMPLE COUNTY RANKINGS (Williamson):")
-williamson = [s for s in final_schools if s['county'] == 'Williamson' and s['flight_score']]
-williamson.sort(key=lambda x: x['flight_score'], reverse=True)
-for s in williamson[:5]:
-    badge = " [FIREFLY]" if s['is_top_county'] else ""
-    print(f"  #{s['county_rank']} {s['school']} - {s['flight_score']}{badge}")
+def write_subgroups(output_dir, merged):
+    """
+    Flight scores, trends, state averages and county ranks per student group,
+    one <group>.json shard each plus an index.json listing them
+    """
+    print("\n[*] Scoring student groups...")
+    directory = ingest.assign_counties(merged['directory'], merged['cgr_info']['county'], merged['county_map'])
+    os.makedirs(output_dir, exist_ok=True)
+
+    index = {'note': 'Student-group Flight Scores use graduation, Ready Grad and ACT only; '
+                     'college-going rates are not published by student group.',
+             'groups': []}
+    for group in merged['groups']:
+        if group == ingest.ALL_STUDENTS:
+            continue
+        output = score_group(directory, merged, group)
+        if output is None:
+            continue
+        filename = shards.file_slug(group) + '.json'
+        shards.write_compressed(os.path.join(output_dir, filename), output)
+        index['groups'].append({
+            'group': group,
+            'file': filename,
+            'schools_count': output['state']['schools_count'],
+            'average_flight_score': output['state']['flight_score']['average']
+        })
+        print(f"   {group}: {output['state']['schools_count']} schools, "
+              f"avg flight score {output['state']['flight_score']['average']}")
+
+    shards.write_compressed(os.path.join(output_dir, shards.INDEX_FILE), index)
+    instrument.count(groups=len(index['groups']))
+    return index
+
+
+def print_summary(output, output_path):
+    final_schools = output['schools']
+    top_improvers = output['top_improvers']
+    index = SchoolIndex(output)
+
+    print(f"\n{'=' * 60}")
+    print(f"SUCCESS! Saved to: {output_path}")
+    print(f"{'=' * 60}")
+    print(f"\nSUMMARY:")
+    print(f"  Total Schools: {len(final_schools)}")
+    print(f"  Counties: {len(set(s['county'] for s in final_schools))}")
+    print(f"  Avg Flight Score: {output['state']['flight_score']['average']}")
+    print(f"\nTOP 5 IMPROVERS (Ready Grad 2-year change):")
+    for i, imp in enumerate(top_improvers[:5], 1):
+        print(f"  {i}. {imp['school']} - +{imp['change']}% (now {imp['rg_2025']}%)")
+
+    print(f"\nTOP 5 SCHOOLS BY FLIGHT SCORE:")
+    for i, s in enumerate(output['leaderboards']['flight_score'][:5], 1):
+        print(f"  {i}. {s['school']} - {s['value']} ({s['county']})")
+
+    print(f"\nSAMPLE COUNTY RANKINGS (Williamson):")
+    for s in index.top('flight_score', 5, county='Williamson'):
+        badge = " [FIREFLY]" if s['is_top_county'] else ""
+        print(f"  #{s['county_rank']} {s['school']} - {s['flight_score']}{badge}")
+
+
+# ========== PIPELINE ==========
+def build_pipeline(input_dir, output_path, cache, jobs=None, state_dir=incremental.DEFAULT_DIR, previous=None,
+                   datasets_dir=None, shards_dir=None, delta_path=None, profile_dir=None, subgroups_dir=None,
+                   search_path=None, peers_path=None, rankings_path=None, snapshot_dir=snapshots.DEFAULT_DIR,
+                   verify=False):
+    """
+    The build's stages:
+
+        loads        one per workbook, run in the process pool
+        merge        join the workbooks and match CGR rows -> counties
+        scoring      state averages, scoring and rankings of the counties
+                     cube, or one incremental update over the changed
+                     schools when `previous` build state is given
+        verify       with `previous` and `verify`: check the incremental
+                     result against a full rebuild; every writing stage
+                     below waits for it
+        datasets     per-metric dataset files, from the counties cube
+        subgroups    student-group shards, from the merge
+        output       the output file, after reading the published one for
+                     the delta manifest
+        derived      search index, peer schools, rank / percentile table,
+                     the snapshot store at `snapshot_dir` (skipped if None)
+                     and, with `shards_dir`, a sharded copy of the output
+        save_state   build state for the next incremental run
+
+    With `profile_dir`, every stage is also cProfiled and memory-traced.
+    """
+    pipeline = Pipeline(jobs, profile_dir=profile_dir, trace_memory=profile_dir is not None)
+
+    loads = []
+    for metric, files, loader, _ in SOURCES:
+        for parts, year in files:
+            name = f"load:{metric}:{year}"
+            pipeline.add(name, cache.load, args=(os.path.join(input_dir, *parts), loader), pool=True)
+            loads.append((name, metric, year))
+    pipeline.add('load:college_going', cache.load,
+                 args=(os.path.join(input_dir, *CGR_FILE), ingest.load_cgr, CGR_SHEET), pool=True)
+
+    pipeline.add('merge', merge_sources, args=([(metric, year) for _, metric, year in loads],),
+                 deps=['load:college_going'] + [name for name, _, _ in loads])
+    pipeline.add('counties', assign_counties, deps=['merge'])
+
+    if previous is None:
+        pipeline.add('state_averages', calculate_state_averages, deps=['counties'])
+        pipeline.add('scoring', score_schools, deps=['counties'])
+        pipeline.add('rankings', rank_schools, deps=['scoring'])
+    else:
+        pipeline.add('incremental', update_incrementally, args=(previous,), deps=['counties'])
+        pipeline.add('state_averages', itemgetter('stats'), deps=['incremental'])
+        pipeline.add('scoring', itemgetter('final'), deps=['incremental'])
+        pipeline.add('rankings', itemgetter('ranked'), deps=['incremental'])
+
+    pipeline.add('build_output', build_output, deps=['state_averages', 'rankings'])
+    # Everything that writes takes the output from here
+    checked, gate = 'build_output', []
+    if verify and previous is not None:
+        pipeline.add('verify', verify_incremental, deps=['counties', 'build_output', 'rankings'])
+        checked, gate = 'verify', ['verify']
+
+    if datasets_dir is None:
+        datasets_dir = os.path.dirname(output_path)
+    pipeline.add('datasets', write_datasets, args=(datasets_dir,), deps=['counties', 'merge'], after=gate)
+    if subgroups_dir is None:
+        subgroups_dir = os.path.join(os.path.dirname(output_path), 'subgroups')
+    pipeline.add('subgroups', write_subgroups, args=(subgroups_dir,), deps=['merge'], after=gate)
+    if delta_path is None:
+        delta_path = os.path.splitext(output_path)[0] + '.delta.json'
+    pipeline.add('previous_output', read_previous_output, args=(output_path,))
+    pipeline.add('delta', write_delta, args=(delta_path,), deps=['previous_output', checked])
+    # The published file is read for the delta before it is overwritten
+    pipeline.add('output', write_output, args=(output_path,), deps=[checked], after=['previous_output'])
+    if search_path is None:
+        search_path = os.path.splitext(output_path)[0] + '.search.json'
+    pipeline.add('search', write_search_index, args=(search_path,), deps=[checked])
+    if peers_path is None:
+        peers_path = os.path.splitext(output_path)[0] + '.peers.json'
+    pipeline.add('peers', write_peers, args=(peers_path,), deps=[checked])
+    if rankings_path is None:
+        rankings_path = os.path.splitext(output_path)[0] + '.rankings.json'
+    pipeline.add('rankings_table', write_rankings, args=(rankings_path,), deps=['rankings'], after=gate)
+    if snapshot_dir:
+        # Only builds whose output was written are snapshotted
+        pipeline.add('snapshot', write_snapshot, args=(snapshot_dir,), deps=[checked], after=['output'])
+    if shards_dir:
+        pipeline.add('shards', write_shards, args=(shards_dir,), deps=['output', checked])
+    # The county ranks are written into the saved school objects, so save after ranking
+    pipeline.add('save_state', incremental.save_state, args=(state_dir,),
+                 deps=['counties', 'scoring', 'state_averages'], after=['rankings'] + gate)
+    return pipeline
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the TNFirefly after-graduation dataset from TDOE workbooks')
+    parser.add_argument('--input-dir', default='.',
+                        help='Folder holding the TDOE workbooks (Graduation Cohort Data/, Ready Graduate/, ...)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Path of the JSON file to write')
+    parser.add_argument('--datasets-dir',
+                        help='Folder for the per-metric dataset files (default: next to --output)')
+    parser.add_argument('--shards-dir',
+                        help='Also write an index plus per-county and per-school shards (.gz/.br) to this folder')
+    parser.add_argument('--delta-output',
+                        help='Path of the delta manifest against the previous output (default: <output>.delta.json)')
+    parser.add_argument('--search-index',
+                        help='Path of the search / autocomplete index (default: <output>.search.json)')
+    parser.add_argument('--peers-output',
+                        help='Path of the similar-schools file (default: <output>.peers.json)')
+    parser.add_argument('--rankings-output',
+                        help='Path of the district / state rank and percentile table (default: <output>.rankings.json)')
+    parser.add_argument('--report',
+                        help=f'Path of the per-stage timing report (default: {instrument.REPORT_FILE} next to --output)')
+    parser.add_argument('--profile', nargs='?', const='build_profile', metavar='DIR',
+                        help='cProfile and tracemalloc every stage, saving <stage>.prof files to DIR (slower)')
+    parser.add_argument('--subgroups-dir',
+                        help='Folder for the per-student-group shards (default: subgroups/ next to --output)')
+    parser.add_argument('--snapshot-dir', default=snapshots.DEFAULT_DIR,
+                        help='Append-only store of per-build snapshots (see snapshots.py)')
+    parser.add_argument('--no-snapshot', action='store_true', help="Don't append this build to the snapshot store")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Worker processes for loading workbooks (1 = load serially in-process)')
+    parser.add_argument('--cache-dir', default=sheet_cache.DEFAULT_DIR, help='Parsed-sheet cache folder')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-parse the workbooks')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Parse workbooks row by row in read-only mode to keep peak memory flat')
+    parser.add_argument('--state-dir', default=incremental.DEFAULT_DIR,
+                        help='Where the build keeps its state for incremental rebuilds')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only recompute schools whose inputs changed since the last build')
+    parser.add_argument('--verify-incremental', action='store_true',
+                        help='With --incremental, also do a full rebuild and fail unless the output is identical')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("BUILDING MEGA DATASET v3 - WITH TRENDS & COUNTY RANKINGS")
+    print("=" * 60)
+
+    cache = SheetCache(args.cache_dir, enabled=not args.no_cache, streaming=args.streaming)
+
+    previous = None
+    if args.incremental or args.verify_incremental:
+        previous = incremental.load_state(args.state_dir)
+        if previous is None:
+            print("\n[*] No usable previous build state, doing a full build")
+
+    pipeline = build_pipeline(args.input_dir, args.output, cache, args.jobs, args.state_dir, previous,
+                              args.datasets_dir, args.shards_dir, args.delta_output, args.profile,
+                              args.subgroups_dir, args.search_index, args.peers_output, args.rankings_output,
+                              None if args.no_snapshot else args.snapshot_dir, args.verify_incremental)
+
+    print(f"\n[*] Loading {sum(1 for s in pipeline.stages.values() if s.pool)} workbooks ({pipeline.jobs} jobs)...")
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    results = pipeline.run()
+
+    print_summary(results['build_output'], results['output'])
+
+    match_report = results['merge']['match_report']
+    report = instrument.build_report(pipeline.stats, time.perf_counter() - wall, time.process_time() - cpu,
+                                     jobs=pipeline.jobs, incremental=previous is not None,
+                                     cgr_match={**{kind: match_report[kind] for kind in MATCH_KINDS},
+                                                'unknown_districts': match_report['unknown_districts']})
+    report_path = args.report or os.path.join(os.path.dirname(args.output), instrument.REPORT_FILE)
+    instrument.write_report(report_path, report)
+    instrument.print_timings(report)
+    print(f"\n  Build report: {report_path}")
+    if args.profile:
+        print(f"  Stage profiles: {args.profile}/*.prof")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+The per-metric datasets published next to the after-graduation file:
+
+    tennessee-act-scores-data.json      ACT by school, with district rollups
+    tennessee-graduation-data.json      graduation and ready grad by school
+    tennessee-college-going-data.json   college-going rate by school
+    tennessee-ready-grad-data.json      ready grad rate by school
+
+All four are emitted from the same SchoolCube as the after-graduation file,
+so every workbook is parsed once and names, counties and numbers agree
+across files. Each file keeps its existing layout and year labels
+('2022-23' in the ACT and graduation files, '2023' elsewhere). State and
+district figures are weighted by students tested / cohort / ready grad
+count where the file has one, and are plain school averages otherwise.
+
+The college-going file lists every CGR row, matched to a cube school or
+not; the cube only supplies names, county and rates for the matched ones.
+No source workbook has dropout figures, so those are carried over from
+the graduation file already at the destination.
+"""
+import json
+import os
+
+import numpy as np
+
+from ingest import CGR_YEARS, county_title
+
+ACT_FILE = 'tennessee-act-scores-data.json'
+GRADUATION_FILE = 'tennessee-graduation-data.json'
+COLLEGE_GOING_FILE = 'tennessee-college-going-data.json'
+READY_GRAD_FILE = 'tennessee-ready-grad-data.json'
+
+# (cube field, published name)
+ACT_FIELDS = [
+    ('composite', 'composite'),
+    ('english', 'english'),
+    ('math', 'math'),
+    ('reading', 'reading'),
+    ('science', 'science'),
+    ('tested', 'students'),
+    ('pct_21_plus', 'pct_21_plus'),
+    ('pct_below_19', 'pct_below_19'),
+]
+DISTRICT_ACT_FIELDS = ['composite', 'english', 'math', 'reading', 'science']
+GRAD_FIELDS = [('rate', 'grad_rate'), ('cohort', 'cohort'), ('grads', 'grads')]
+READY_GRAD_FIELDS = [('rate', 'pct_ready'), ('n_ready', 'n_ready'), ('count', 'n_count')]
+
+
+def school_year(year):
+    """'2023' -> '2022-23'"""
+    return f"{int(year) - 1}-{year[2:]}"
+
+
+def _value(v):
+    v = float(v)
+    return None if v != v else v
+
+
+def _round(v):
+    v = _value(v)
+    return None if v is None else round(v, 1)
+
+
+def _rows_with(cube, metric):
+    return np.flatnonzero(cube.seen[:, cube.metric_index[metric], :].any(axis=1))
+
+
+def _latest_year(cube, metric, field):
+    present = ~np.isnan(cube.series(metric, field))
+    years = [year for year, y in cube.year_index.items() if present[:, y].any()]
+    return years[-1] if years else None
+
+
+def _by_codes(cube, rows):
+    return rows[np.lexsort((cube.school_codes[rows], cube.system_codes[rows]))]
+
+
+def _by_names(cube, rows, columns):
+    names = {column: cube.names(column) for column in columns}
+    return np.array(sorted(rows, key=lambda r: tuple(names[c][r] or '' for c in columns)), dtype=np.int64)
+
+
+def _years(record, fields, label=school_year):
+    return {label(year): {out: data[field] for field, out in fields} for year, data in record.items()}
+
+
+def weighted_rollup(groups, values, weights, n_groups):
+    """
+    Per-group weighted mean of `values` and total weight, over rows where
+    both are present. Groups with no usable rows get NaN / 0.
+    """
+    usable = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    w = np.where(usable, weights, 0.0)
+    total = np.bincount(groups, weights=w, minlength=n_groups)
+    weighted = np.bincount(groups, weights=np.where(usable, values, 0.0) * w, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return weighted / total, total
+
+
+def _state_weighted(values, weights):
+    mean, total = weighted_rollup(np.zeros(len(values), dtype=np.int64), values, weights, 1)
+    return _round(mean[0]), int(total[0])
+
+
+def act_dataset(cube):
+    rows = _by_codes(cube, _rows_with(cube, 'act'))
+    year = _latest_year(cube, 'act', 'composite')
+    records = cube.records(rows, {'act': [field for field, _ in ACT_FIELDS]})
+    latest = cube.latest('act', 'composite', cube.years)[rows]
+    districts = cube.names('district')
+
+    tested = cube.get('act', 'tested', year)
+    composite, students = _state_weighted(cube.get('act', 'composite', year)[rows], tested[rows])
+
+    # District rollups for the latest year, in district code order
+    district_ids = cube.name_ids[rows, 0]
+    n_groups = len(cube.strings)
+    rollups = {field: weighted_rollup(district_ids, cube.get('act', field, year)[rows], tested[rows], n_groups)[0]
+               for field in DISTRICT_ACT_FIELDS + ['pct_21_plus']}
+    totals = weighted_rollup(district_ids, cube.get('act', 'composite', year)[rows], tested[rows], n_groups)[1]
+
+    district_section = {}
+    for group in dict.fromkeys(district_ids.tolist()):
+        if group < 0 or not totals[group]:
+            continue
+        entry = {field: _round(rollups[field][group]) for field in DISTRICT_ACT_FIELDS}
+        entry['students'] = int(totals[group])
+        entry['pct_21_plus'] = _round(rollups['pct_21_plus'][group])
+        district_section[cube.strings[group]] = entry
+
+    schools = []
+    for i, row in enumerate(rows):
+        schools.append({
+            'district_code': int(cube.system_codes[row]),
+            'district': districts[row],
+            'school_code': int(cube.school_codes[row]),
+            'school': cube.names('school')[row],
+            'years': _years(records[i]['act'], ACT_FIELDS),
+            'composite': _value(latest[i])
+        })
+
+    return {
+        'state': {'composite': composite, 'students': students, 'year': school_year(year) if year else None},
+        'districts': district_section,
+        'schools': schools
+    }
+
+
+def previous_dropout(path):
+    """
+    Dropout figures of a published graduation file:
+    ({(district_code, school_code): (dropout_years, dropout_rate)}, state fields)
+    """
+    if not os.path.exists(path):
+        return {}, {}
+    with open(path) as f:
+        published = json.load(f)
+    schools = {(s['district_code'], s['school_code']): (s.get('dropout_years') or {}, s.get('dropout_rate'))
+               for s in published.get('schools', [])}
+    state = {field: published.get('state', {}).get(field) for field in ('dropout_rate', 'dropout_count')}
+    return schools, state
+
+
+def graduation_dataset(cube, dropout=None):
+    """`dropout` is previous_dropout()'s result, carried through unchanged"""
+    dropout_schools, dropout_state = dropout or ({}, {})
+    rows = _by_codes(cube, _rows_with(cube, 'graduation'))
+    year = _latest_year(cube, 'graduation', 'rate')
+    records = cube.records(rows, {'graduation': [f for f, _ in GRAD_FIELDS], 'ready_grad': [f for f, _ in READY_GRAD_FIELDS]})
+    grad_rate = cube.latest('graduation', 'rate', cube.years)[rows]
+    ready_grad = cube.latest('ready_grad', 'rate', cube.years)[rows]
+    districts = cube.names('district')
+    names = cube.names('school')
+
+    state_rate, cohort = _state_weighted(cube.get('graduation', 'rate', year)[rows],
+                                         cube.get('graduation', 'cohort', year)[rows])
+
+    schools = []
+    for i, row in enumerate(rows):
+        codes = (int(cube.system_codes[row]), int(cube.school_codes[row]))
+        dropout_years, dropout_rate = dropout_schools.get(codes, ({}, None))
+        schools.append({
+            'district_code': codes[0],
+            'district': districts[row],
+            'school_code': codes[1],
+            'school': names[row],
+            'grad_years': _years(records[i]['graduation'], GRAD_FIELDS),
+            'ready_grad_years': _years(records[i]['ready_grad'], READY_GRAD_FIELDS),
+            'grad_rate': _value(grad_rate[i]),
+            'ready_grad': _value(ready_grad[i]),
+            'dropout_years': dropout_years,
+            'dropout_rate': dropout_rate
+        })
+
+    return {
+        'state': {
+            'grad_rate': state_rate,
+            'cohort': cohort,
+            'year': school_year(year) if year else None,
+            'dropout_rate': dropout_state.get('dropout_rate'),
+            'dropout_count': dropout_state.get('dropout_count')
+        },
+        'schools': schools
+    }
+
+
+def _cgr_rows(cgr):
+    """
+    The CGR rows to publish: one per matched school (its exact rows win, then
+    the last row) and one per unmatched (district, school) name, rows with no
+    rate at all dropped
+    """
+    cgr = cgr[cgr[CGR_YEARS].notna().any(axis=1)]
+    matched = cgr['key'].notna()
+    exact = cgr['match'] == 'exact'
+    keep = ~matched | exact | ~cgr['key'].isin(cgr.loc[exact, 'key'])
+    cgr = cgr[keep]
+    cgr = cgr[~cgr.duplicated('key', keep='last') | ~matched].drop_duplicates(
+        ['district_upper', 'school_upper'], keep='last')
+    county = county_title(cgr['county'].astype(str).str.strip())
+    return cgr.assign(county=county.where(cgr['county'].notna(), None))
+
+
+def college_going_dataset(cube, cgr):
+    """
+    `cgr` holds every valid CGR row with its matched school key (or None),
+    match kind and ACT code, as in the build's merged sources
+    """
+    series = cube.series('college_going', 'rate')
+    latest = cube.latest('college_going', 'rate', cube.years)
+    names = {column: cube.names(column) for column in ('county', 'district', 'school')}
+    row_of = {key: row for row, key in enumerate(cube.keys)}
+
+    schools = []
+    for entry in _cgr_rows(cgr).to_dict('records'):
+        row = row_of.get(entry['key'])
+        if row is not None and not np.isnan(series[row]).all():
+            school = {
+                'county': names['county'][row] or 'Unknown',
+                'district': names['district'][row],
+                'school': names['school'][row],
+                'cgr_years': {y: _value(series[row, cube.year_index[y]]) for y in cube.years
+                              if not np.isnan(series[row, cube.year_index[y]])},
+                'cgr_rate': _value(latest[row])
+            }
+        else:
+            years = {y: _value(entry[y]) for y in CGR_YEARS if entry[y] == entry[y]}
+            school = {
+                'county': entry['county'] or 'Unknown',
+                'district': str(entry['district']).strip(),
+                'school': str(entry['school']).strip(),
+                'cgr_years': years,
+                'cgr_rate': years[max(years)]
+            }
+        school['act_code'] = entry['act_code'] if isinstance(entry['act_code'], str) else None
+        schools.append(school)
+    schools.sort(key=lambda s: (s['county'], s['district'] or '', s['school'] or ''))
+    schools = [{field: s[field] for field in ('county', 'district', 'school', 'act_code', 'cgr_years', 'cgr_rate')}
+               for s in schools]
+
+    years = sorted({y for s in schools for y in s['cgr_years']})
+    year = years[-1] if years else None
+    values = np.array([s['cgr_years'].get(year, np.nan) if year else np.nan for s in schools], dtype=np.float64)
+    present = ~np.isnan(values)
+    state_rate = round(float(np.round(values[present] * 10).sum()) / (present.sum() * 10), 1) if present.any() else None
+
+    return {
+        'state': {
+            'cgr_rate': state_rate,
+            'schools_count': len(schools),
+            'counties_count': len(set(s['county'] for s in schools)),
+            'year': f"Class of {year}" if year else None
+        },
+        'schools': schools
+    }
+
+
+def ready_grad_dataset(cube):
+    series = cube.series('ready_grad', 'rate')
+    rows = _by_names(cube, np.flatnonzero(~np.isnan(series).all(axis=1)), ['school'])
+    year = _latest_year(cube, 'ready_grad', 'rate')
+    latest = cube.latest('ready_grad', 'rate', cube.years)[rows]
+    names = {column: cube.names(column) for column in ('county', 'district', 'school')}
+
+    state_rate, _ = _state_weighted(cube.get('ready_grad', 'rate', year)[rows],
+                                    cube.get('ready_grad', 'count', year)[rows])
+
+    schools = []
+    for i, row in enumerate(rows):
+        schools.append({
+            'county': names['county'][row] or 'Unknown',
+            'district': names['district'][row],
+            'school': names['school'][row],
+            'ready_grad_rate': _value(latest[i]),
+            'ready_grad_years': {y: _value(series[row, cube.year_index[y]]) for y in cube.years
+                                 if not np.isnan(series[row, cube.year_index[y]])}
+        })
+
+    return {
+        'state': {
+            'ready_grad_rate': state_rate,
+            'schools_count': len(schools),
+            'counties_count': len(set(s['county'] for s in schools)),
+            'year': f"Class of {year}" if year else None
+        },
+        'schools': schools
+    }
+
+
+# json.dump options matching each published file
+DUMP_OPTIONS = {
+    ACT_FILE: {'separators': (',', ':')},
+    GRADUATION_FILE: {},
+    COLLEGE_GOING_FILE: {'indent': 2},
+    READY_GRAD_FILE: {'indent': 2},
+}
+
+
+def build_datasets(cube, cgr, dropout=None):
+    return {
+        ACT_FILE: act_dataset(cube),
+        GRADUATION_FILE: graduation_dataset(cube, dropout),
+        COLLEGE_GOING_FILE: college_going_dataset(cube, cgr),
+        READY_GRAD_FILE: ready_grad_dataset(cube),
+    }
+
+
+def write_datasets(output_dir, cube, cgr):
+    """Write every dataset into output_dir; returns {path: school count}"""
+    os.makedirs(output_dir or '.', exist_ok=True)
+    dropout = previous_dropout(os.path.join(output_dir, GRADUATION_FILE))
+    written = {}
+    for filename, data in build_datasets(cube, cgr, dropout).items():
+        path = os.path.join(output_dir, filename)
+        with open(path, 'w') as f:
+            json.dump(data, f, **DUMP_OPTIONS[filename])
+        written[path] = len(data['schools'])
+    return written
@@ -0,0 +1,107 @@
+"""
+Content hashes for school records and build-to-build delta manifests.
+
+Every school in the output carries a `content_hash` of its canonical JSON,
+so a client or CDN can tell whether its copy is current without comparing
+the record itself. After each build a manifest lists what changed against
+the previously published output:
+
+    {
+      "previous": <dataset hash or null>, "current": <dataset hash>,
+      "added": [id, ...], "removed": [id, ...],
+      "changed": {id: [JSON patch ops], ...},
+      "summary": [JSON patch ops for meta / state / top_improvers / leaderboards]
+    }
+
+Ids are the shard ids from shards.shard_ids (the slug, made unique), so
+they double as schools/<id>.json in the sharded output. Only records whose
+hash differs are diffed.
+"""
+import hashlib
+import json
+
+from shards import shard_ids
+
+HASH_FIELD = 'content_hash'
+SUMMARY_FIELDS = ['meta', 'state', 'top_improvers', 'leaderboards']
+
+
+def content_hash(record):
+    """16 hex chars of sha256 over the record's canonical JSON, ignoring any existing hash"""
+    if HASH_FIELD in record:
+        record = {k: v for k, v in record.items() if k != HASH_FIELD}
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def with_hashes(schools):
+    """Copies of the school objects with content_hash added"""
+    return [{**school, HASH_FIELD: content_hash(school)} for school in schools]
+
+
+def dataset_hash(output):
+    """Hash of a whole output: its summary parts plus every record hash, in order"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({k: output.get(k) for k in SUMMARY_FIELDS}, sort_keys=True).encode('utf-8'))
+    for school in output['schools']:
+        digest.update((school.get(HASH_FIELD) or content_hash(school)).encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+def _pointer(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def json_patch(old, new, path=''):
+    """RFC 6902 style ops turning `old` into `new`; lists are replaced whole"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{_pointer(key)}"})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': f"{path}/{_pointer(key)}", 'value': value})
+            elif old[key] != value:
+                ops.extend(json_patch(old[key], value, f"{path}/{_pointer(key)}"))
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def _by_id(schools):
+    return dict(zip(shard_ids(schools), schools))
+
+
+def build_manifest(previous, output):
+    """Delta from the `previous` output (None for a first build) to `output`"""
+    current = _by_id(output['schools'])
+    if previous is None:
+        return {
+            'previous': None,
+            'current': dataset_hash(output),
+            'added': list(current),
+            'removed': [],
+            'changed': {},
+            'summary': []
+        }
+
+    before = _by_id(previous['schools'])
+    changed = {}
+    for school_id, school in current.items():
+        old = before.get(school_id)
+        if old is None:
+            continue
+        old_hash = old.get(HASH_FIELD) or content_hash(old)
+        if old_hash != school[HASH_FIELD]:
+            changed[school_id] = json_patch(old, school)
+
+    return {
+        'previous': dataset_hash(previous),
+        'current': dataset_hash(output),
+        'added': [school_id for school_id in current if school_id not in before],
+        'removed': [school_id for school_id in before if school_id not in current],
+        'changed': changed,
+        'summary': json_patch({k: previous.get(k) for k in SUMMARY_FIELDS}, {k: output[k] for k in SUMMARY_FIELDS})
+    }
@@ -0,0 +1,276 @@
+"""
+Batch TNFirefly Flight Score engine.
+
+Scores every school under many weight vectors at once: the inputs are a
+(school, metric) matrix with a missing-value mask, and a batch of K weight
+vectors produces a (K, school) score matrix with the same renormalization
+over missing metrics, momentum bonus and 0-100 clamping as the build.
+
+Also a CLI for what-if sweeps over weights and tier thresholds:
+
+    python flight_engine.py --data tennessee-after-graduation-data.json --step 0.05
+"""
+import argparse
+import itertools
+import json
+
+import numpy as np
+
+# Column order of the input matrix and of every weight vector
+METRICS = ['ready_grad', 'college_going', 'act', 'graduation']
+DEFAULT_WEIGHTS = (0.40, 0.25, 0.20, 0.15)
+
+# Tier minimums, best first; anything below the last is 'grow'
+TIER_KEYS = ['elite', 'strong', 'ready', 'building', 'grow', 'na']
+DEFAULT_THRESHOLDS = (85, 70, 55, 40)
+
+# Ready Grad 2-year change -> bonus; drops of the same size lose the same points
+MOMENTUM = [(10, 5), (5, 3)]
+
+MIN_METRICS = 2
+
+
+def normalize_act(act):
+    """ACT composite 10-36 mapped onto 0-100"""
+    return np.clip((act - 10) * (100 / 26), 0, 100)
+
+
+def momentum_bonus(change):
+    change = np.asarray(change, dtype=np.float64)
+    bonus = np.zeros_like(change)
+    for threshold, points in reversed(MOMENTUM):
+        bonus = np.where(change >= threshold, points, bonus)
+        bonus = np.where(change <= -threshold, -points, bonus)
+    return bonus
+
+
+def python_round(values):
+    """round(v, 1) per value, so batch scores match the per-school build exactly"""
+    return [None if v != v else round(v, 1) for v in values.tolist()]
+
+
+class FlightScoreEngine:
+    """
+    engine = FlightScoreEngine(ready_grad, college_going, act, graduation, rg_change)
+    scores = engine.raw_scores(weights)   # weights: (K, 4) -> (K, N), NaN = no score
+
+    Inputs are per-school arrays with NaN for missing values; `act` is the
+    raw composite and `rg_change` the unrounded 2025 - 2023 Ready Grad change.
+    """
+
+    def __init__(self, ready_grad, college_going, act, graduation, rg_change):
+        matrix = np.column_stack([
+            np.asarray(ready_grad, dtype=np.float64),
+            np.asarray(college_going, dtype=np.float64),
+            normalize_act(np.asarray(act, dtype=np.float64)),
+            np.asarray(graduation, dtype=np.float64),
+        ])
+        self.present = ~np.isnan(matrix)
+        self.values = np.where(self.present, matrix, 0.0)
+        self.valid = self.present.sum(axis=1) >= MIN_METRICS
+        self.bonus = momentum_bonus(rg_change)
+
+    @classmethod
+    def from_schools(cls, schools):
+        """Engine over school objects from the built JSON"""
+        def rate(school, metric, year):
+            value = (school[metric].get(year) or {}).get('rate')
+            return np.nan if value is None else value
+
+        def latest(name):
+            return [np.nan if s['latest'][name] is None else s['latest'][name] for s in schools]
+
+        rg_change = [rate(s, 'ready_grad', '2025') - rate(s, 'ready_grad', '2023') for s in schools]
+        return cls(latest('ready_grad_rate'), latest('college_going_rate'), latest('act_composite'),
+                   latest('graduation_rate'), rg_change)
+
+    def __len__(self):
+        return len(self.values)
+
+    def raw_scores(self, weights=DEFAULT_WEIGHTS):
+        """
+        (K, N) clamped, unrounded scores for K weight vectors.
+        Terms are accumulated metric by metric, in the build's order, so the
+        default weights reproduce its floating-point results exactly.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        score = np.zeros((len(weights), len(self)))
+        total_weight = np.zeros((len(weights), len(self)))
+        for j in range(len(METRICS)):
+            score += self.values[None, :, j] * weights[:, j, None]
+            total_weight += np.where(self.present[None, :, j], weights[:, j, None], 0.0)
+
+        usable = self.valid[None, :] & (total_weight > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = score / total_weight + self.bonus[None, :]
+        return np.where(usable, np.clip(score, 0, 100), np.nan)
+
+    def scores(self, weights=DEFAULT_WEIGHTS):
+        """Rounded scores for one weight vector, None where a school can't be scored"""
+        return python_round(self.raw_scores(weights)[0])
+
+
+def tier_codes(scores, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Index into TIER_KEYS for each score. `thresholds` is one (4,) tuple or a
+    (K, 4) batch matching the rows of `scores`.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if thresholds.ndim == 1:
+        thresholds = np.broadcast_to(thresholds, (len(scores), len(thresholds)))
+    codes = (scores[:, :, None] < thresholds[:, None, :]).sum(axis=2)
+    return np.where(np.isnan(scores), len(TIER_KEYS) - 1, codes)
+
+
+def county_ranks(scores, county_ids):
+    """
+    (K, N) county rank by score for every config, 0 for unscored schools.
+    Ties keep input order, as the build's stable sort does.
+    """
+    county_ids = np.asarray(county_ids, dtype=np.int64)
+    tenths = np.where(np.isnan(scores), -1, np.round(scores * 10)).astype(np.int64)
+    # Sort key: county first, then score descending, unscored last
+    order = np.argsort(county_ids[None, :] * 2048 + (1023 - tenths), axis=1, kind='stable')
+
+    starts = np.zeros(county_ids.max() + 2 if len(county_ids) else 1, dtype=np.int64)
+    np.add.at(starts, county_ids + 1, 1)
+    starts = np.cumsum(starts)
+
+    positions = np.arange(scores.shape[1])[None, :] - starts[county_ids[order]]
+    ranks = np.zeros(scores.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, positions + 1, axis=1)
+    return np.where(np.isnan(scores), 0, ranks)
+
+
+def make_configs(weights, thresholds):
+    """Cross product of weight vectors and tier threshold tuples, baseline first"""
+    configs = [(tuple(DEFAULT_WEIGHTS), tuple(DEFAULT_THRESHOLDS))]
+    for w, t in itertools.product(weights, thresholds):
+        config = (tuple(float(x) for x in w), tuple(float(x) for x in t))
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def weight_grid(step):
+    """Every weight vector on a `step` grid that sums to 1"""
+    n = int(round(1 / step))
+    grid = []
+    for a in range(n + 1):
+        for b in range(n + 1 - a):
+            for c in range(n + 1 - a - b):
+                grid.append((a * step, b * step, c * step, (n - a - b - c) * step))
+    return [tuple(round(x, 6) for x in w) for w in grid]
+
+
+def random_weights(count, seed=None):
+    return [tuple(w) for w in np.random.default_rng(seed).dirichlet(np.ones(len(METRICS)), size=count).round(4)]
+
+
+def sweep(engine, configs, county_ids, chunk=512):
+    """
+    Score every config and summarize how tiers and county ranks move
+    relative to configs[0] (the baseline). Returns one dict per config.
+    """
+    base = np.round(engine.raw_scores(configs[0][0]), 1)
+    base_ranks = county_ranks(base, county_ids)[0]
+    base_scored = base_ranks > 0
+
+    results = []
+    for start in range(0, len(configs), chunk):
+        batch = configs[start:start + chunk]
+        weights = np.array([w for w, _ in batch])
+        thresholds = np.array([t for _, t in batch])
+
+        scores = np.round(engine.raw_scores(weights), 1)
+        tiers = tier_codes(scores, thresholds)
+        ranks = county_ranks(scores, county_ids)
+
+        both = base_scored[None, :] & (ranks > 0)
+        shift = np.where(both, np.abs(ranks - base_ranks[None, :]), 0)
+        badge = (ranks > 0) & (ranks <= 3)
+        base_badge = base_scored & (base_ranks <= 3)
+
+        for k, (w, t) in enumerate(batch):
+            n_both = int(both[k].sum())
+            valid = ~np.isnan(scores[k])
+            results.append({
+                'weights': dict(zip(METRICS, w)),
+                'tiers': dict(zip(TIER_KEYS, t)),
+                'average_score': round(float(scores[k][valid].mean()), 1) if valid.any() else None,
+                'tier_counts': {key: int((tiers[k] == i).sum()) for i, key in enumerate(TIER_KEYS)},
+                'rank_stability': {
+                    'unchanged_pct': round(100 * int((both[k] & (shift[k] == 0)).sum()) / n_both, 1) if n_both else None,
+                    'mean_abs_shift': round(float(shift[k].sum()) / n_both, 2) if n_both else None,
+                    'max_shift': int(shift[k].max()) if n_both else None,
+                    'badge_changes': int((badge[k] != base_badge).sum()),
+                    'leader_changes': int(((ranks[k] == 1) & (base_ranks != 1)).sum()),
+                }
+            })
+    return results
+
+
+def _parse_tuple(text):
+    return tuple(float(x) for x in text.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='What-if sweeps of Flight Score weights and tier thresholds')
+    parser.add_argument('--data', default='tennessee-after-graduation-data.json', help='Built dataset to score')
+    parser.add_argument('--step', type=float, help='Sweep every weight vector on this grid (e.g. 0.05)')
+    parser.add_argument('--random', type=int, default=0, help='Also sweep this many random weight vectors')
+    parser.add_argument('--seed', type=int, help='Seed for --random')
+    parser.add_argument('--weights', action='append', type=_parse_tuple, default=[],
+                        help='Explicit weights as ready_grad,college_going,act,graduation (repeatable)')
+    parser.add_argument('--tiers', action='append', type=_parse_tuple, default=[],
+                        help='Tier minimums as elite,strong,ready,building (repeatable)')
+    parser.add_argument('--sort', default='unchanged_pct',
+                        choices=['unchanged_pct', 'mean_abs_shift', 'badge_changes', 'leader_changes'],
+                        help='Rank-stability column to order the report by (least stable first)')
+    parser.add_argument('--top', type=int, default=15, help='Configurations to print')
+    parser.add_argument('--output', help='Write every configuration summary to this JSON file')
+    args = parser.parse_args(argv)
+
+    with open(args.data) as f:
+        schools = json.load(f)['schools']
+
+    weights = list(args.weights)
+    if args.step:
+        weights += weight_grid(args.step)
+    if args.random:
+        weights += random_weights(args.random, args.seed)
+    if not weights:
+        weights = [DEFAULT_WEIGHTS]
+    configs = make_configs(weights, args.tiers or [DEFAULT_THRESHOLDS])
+
+    engine = FlightScoreEngine.from_schools(schools)
+    counties = sorted(set(s['county'] for s in schools))
+    county_ids = [counties.index(s['county']) for s in schools]
+
+    results = sweep(engine, configs, county_ids)
+
+    print(f"Swept {len(results)} configurations over {len(engine)} schools")
+    baseline = results[0]
+    print(f"Baseline {baseline['weights']} tiers {baseline['tiers']}: {baseline['tier_counts']}")
+
+    descending = args.sort != 'unchanged_pct'
+    ordered = sorted(results[1:], key=lambda r: r['rank_stability'][args.sort] or 0, reverse=descending)
+    print(f"\n{'weights (rg/cg/act/grad)':<28}{'tiers':<20}{'avg':>6}  {'elite/strong/ready/build/grow/na':<34}"
+          f"{'same%':>7}{'shift':>7}{'badge':>7}{'lead':>6}")
+    for r in ordered[:args.top]:
+        w = '/'.join(f"{x:.2f}" for x in r['weights'].values())
+        t = '/'.join(f"{x:g}" for x in r['tiers'].values())
+        counts = '/'.join(str(c) for c in r['tier_counts'].values())
+        stability = r['rank_stability']
+        print(f"{w:<28}{t:<20}{r['average_score']!s:>6}  {counts:<34}"
+              f"{stability['unchanged_pct']!s:>7}{stability['mean_abs_shift']!s:>7}"
+              f"{stability['badge_changes']:>7}{stability['leader_changes']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {len(results)} configurations to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
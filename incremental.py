@@ -0,0 +1,101 @@
+"""
+State kept between builds so a rebuild only redoes the schools whose
+inputs changed.
+
+After every build the merged SchoolCube, the finished school objects and the
+running state-average sums are pickled to the state directory. The next
+incremental build diffs its freshly merged cube against them, rescores
+only the changed schools, adjusts the state averages by subtracting old
+contributions and adding new ones, and re-ranks (a single vectorized pass,
+see ranking.py).
+"""
+import os
+import pickle
+
+import ingest
+
+STATE_VERSION = 2
+STATE_FILE = 'build_state.pkl'
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.build_state')
+
+# (metric, field) pairs that feed the state averages
+AVERAGED_FIELDS = [
+    ('graduation', 'rate'),
+    ('ready_grad', 'rate'),
+    ('college_going', 'rate'),
+    ('act', 'composite'),
+]
+
+
+class RunningAverages:
+    """
+    Per (metric, year) sums and counts for the state averages.
+
+    Values are 1-decimal rates, so sums are kept as integer tenths. That makes
+    add/remove exact: an incrementally updated average is bit-for-bit the one
+    a full rebuild computes, whatever order schools were added in.
+    """
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, cube, rows=None, sign=1):
+        """Add the given rows of a SchoolCube (all rows if None)"""
+        for metric, field in AVERAGED_FIELDS:
+            for year, (tenths, count) in cube.totals(metric, field, rows).items():
+                total = self.totals.setdefault((metric, year), [0, 0])
+                total[0] += sign * tenths
+                total[1] += sign * count
+
+    def remove(self, cube, rows):
+        self.add(cube, rows, sign=-1)
+
+    def averages(self):
+        result = {}
+        for metric, _ in AVERAGED_FIELDS:
+            result[metric] = {}
+            years = sorted(year for (m, year), (_, count) in self.totals.items() if m == metric and count)
+            for year in years:
+                tenths, count = self.totals[(metric, year)]
+                result[metric][year] = round(tenths / (count * 10), 1)
+        return result
+
+
+def state_path(directory):
+    return os.path.join(directory, STATE_FILE)
+
+
+def load_state(directory):
+    """Previous build's state, or None if missing or written by another version"""
+    path = state_path(directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except Exception:
+        return None
+    if state.get('version') != (STATE_VERSION, ingest.LOADER_VERSION):
+        return None
+    return state
+
+
+def save_state(directory, cube, final, averages):
+    """
+    cube:     merged SchoolCube (what the next build diffs against)
+    final:    key -> finished school object, including county rank fields
+    averages: RunningAverages over `cube`
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = state_path(directory)
+    state = {
+        'version': (STATE_VERSION, ingest.LOADER_VERSION),
+        'cube': cube,
+        'final': final,
+        'averages': averages
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,280 @@
+"""
+Columnar ingestion for the TDOE workbooks.
+
+Each loader takes a parsed sheet and returns one row per school and student
+group with the metric fields already coerced, using whole-column pandas
+operations instead of per-row iterrows()/try-except. The build splits the
+frames by group; each group's per-year frames are then joined side by side
+on the `system-school` key and school_cube.SchoolCube takes it from there.
+"""
+import numpy as np
+import pandas as pd
+
+import instrument
+
+# Bump whenever a loader's output changes so cached sheets are re-parsed
+LOADER_VERSION = 3
+
+ALL_STUDENTS = 'All Students'
+
+NAME_FIELDS = ['system_code', 'district', 'school_code', 'school']
+
+GRAD_FIELDS = {
+    'rate': 'grad_rate_state',
+    'cohort': ['grad_cohort_state', 'grad_cohort'],
+    'grads': ['grad_count_state', 'grad_count']
+}
+READY_GRAD_FIELDS = {'rate': 'pct_ready_grad', 'count': 'n_count', 'n_ready': ['n_ready_grad', 'n_ready']}
+ACT_FIELDS = {
+    'composite': 'Average Composite Score',
+    'english': 'Average English Score',
+    'math': 'Average Math Score',
+    'reading': 'Average Reading Score',
+    'science': 'Average Science Score',
+    'pct_21_plus': 'Percent Scoring 21 or Higher',
+    'tested': 'Valid Tests',
+    'pct_below_19': 'Percent Scoring Below 19'
+}
+INT_FIELDS = {'cohort', 'count', 'tested', 'grads', 'n_ready'}
+# Not in every year's layout; null when the workbook lacks the column
+OPTIONAL_FIELDS = {'grads', 'n_ready', 'pct_below_19'}
+
+CGR_ACT_CODE = ['ACT_Code', 'ACT Code', 'HS_ACT_Code']
+
+# Title-casing gets these county names wrong
+COUNTY_NAMES = {'Mcminn': 'McMinn', 'Mcnairy': 'McNairy', 'Dekalb': 'DeKalb'}
+
+CGR_YEARS = ['2019', '2020', '2021', '2022', '2023']
+# Every column load_cgr may read
+CGR_COLUMNS = ['HS_District', 'HS_County', 'High_School'] + [f'Class of {yr} CGR' for yr in CGR_YEARS] + CGR_ACT_CODE
+
+
+def coerce_numeric(values):
+    """
+    Suppression-aware numeric coercion for a whole column.
+    TDOE suppresses small cells with '*', '<5', '-' etc; all become NaN.
+    """
+    return pd.to_numeric(values, errors='coerce')
+
+
+def coerce_float(values, decimals=1):
+    return coerce_numeric(values).round(decimals)
+
+
+def coerce_int(values):
+    """Whole-column int(): truncates toward zero, suppressed cells become <NA>"""
+    return np.trunc(coerce_numeric(values)).astype('Int64')
+
+
+def coerce_pct(values, decimals=1):
+    """
+    Coerce a rate column to percentages. Columns stored as fractions
+    (every value <= 1) are scaled to 0-100 before rounding.
+    """
+    values = coerce_numeric(values)
+    if values.notna().any() and values.max() <= 1:
+        values = values * 100
+    return values.round(decimals)
+
+
+def school_keys(system, school):
+    """Vectorized `system-school` keys from the two code columns"""
+    return system.astype('int64').astype(str) + '-' + school.astype('int64').astype(str)
+
+
+def _schools_frame(df, system, district, school, name):
+    codes = pd.DataFrame({
+        'system_code': coerce_numeric(df[system]),
+        'school_code': coerce_numeric(df[school])
+    }, index=df.index).dropna()
+
+    frame = pd.DataFrame({
+        'system_code': codes['system_code'].astype('int64'),
+        'district': df.loc[codes.index, district],
+        'school_code': codes['school_code'].astype('int64'),
+        'school': df.loc[codes.index, name]
+    })
+    frame.insert(0, 'key', school_keys(frame['system_code'], frame['school_code']))
+    return frame
+
+
+def _load(df, group_col, codes, fields):
+    """
+    One row per (school, student group), every group in the sheet.
+    Group and name columns are categorical: a few dozen groups and a few
+    hundred names repeat across every row.
+    """
+    frame = _schools_frame(df, *codes)
+    frame.insert(1, 'group', df.loc[frame.index, group_col])
+    for field, source in fields.items():
+        source = source_column(df.columns, field, source)
+        if source is None:
+            frame[field] = float('nan')
+        else:
+            frame[field] = df.loc[frame.index, source]
+    return finish_schools(frame, fields, len(df))
+
+
+def source_column(columns, field, source):
+    """The first candidate column present; None for a missing optional field"""
+    candidates = source if isinstance(source, list) else [source]
+    found = next((col for col in candidates if col in columns), None)
+    if found is None and field not in OPTIONAL_FIELDS:
+        raise KeyError(candidates[0])
+    return found
+
+
+def finish_schools(frame, fields, rows_read):
+    """Coerce the metric columns, drop duplicate rows and categorize the names"""
+    for field in fields:
+        frame[field] = coerce_int(frame[field]) if field in INT_FIELDS else coerce_float(frame[field])
+    # A school listed twice for a group in one file keeps its last row, as the row loop did
+    frame = frame.drop_duplicates(['key', 'group'], keep='last').reset_index(drop=True)
+    for column in ('group', 'district', 'school'):
+        frame[column] = frame[column].astype('category')
+    instrument.count(rows_read=rows_read, rows_kept=int((frame['group'] == ALL_STUDENTS).sum()),
+                     subgroup_rows=int((frame['group'] != ALL_STUDENTS).sum()))
+    return frame
+
+
+def split_groups(frame):
+    """{student group: that group's rows without the group column}, in one pass"""
+    return {
+        group: rows.drop(columns='group').reset_index(drop=True)
+        for group, rows in frame.groupby('group', observed=True, sort=False)
+    }
+
+
+# (student group column, (system, district, school, school name) columns, fields) per layout
+GRAD_LAYOUT = ('student_group', ('system', 'system_name', 'school', 'school_name'), GRAD_FIELDS)
+READY_GRAD_LAYOUT = ('student_group', ('system', 'system_name', 'school', 'school_name'), READY_GRAD_FIELDS)
+ACT_LAYOUT = ('Subgroup', ('District', 'District Name', 'School', 'School Name'), ACT_FIELDS)
+
+
+def load_graduation(df):
+    return _load(df, *GRAD_LAYOUT)
+
+
+def load_ready_grad(df):
+    return _load(df, *READY_GRAD_LAYOUT)
+
+
+def load_act(df):
+    return _load(df, *ACT_LAYOUT)
+
+
+def load_cgr(df):
+    """
+    CGR by HS rows with normalized names and per-class rates.
+    The sheet has no codes; rows are matched to schools by name later.
+    """
+    instrument.count(rows_read=len(df), rows_kept=len(df))
+    frame = pd.DataFrame({
+        'district': df['HS_District'],
+        'county': df['HS_County'],
+        'school': df['High_School'],
+        'district_upper': df['HS_District'].astype(str).str.strip().str.upper(),
+        'county_upper': df['HS_County'].astype(str).str.strip().str.upper(),
+        'school_upper': df['High_School'].astype(str).str.strip().str.upper()
+    })
+    for yr in CGR_YEARS:
+        col = f'Class of {yr} CGR'
+        frame[yr] = coerce_pct(df[col]) if col in df.columns else float('nan')
+
+    act_code = next((col for col in CGR_ACT_CODE if col in df.columns), None)
+    if act_code is None:
+        frame['act_code'] = None
+    else:
+        codes = df[act_code].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+        frame['act_code'] = codes.where(df[act_code].notna(), None)
+    return frame
+
+
+# Loader name -> its layout, for readers that don't go through a DataFrame (streaming.py)
+SCHOOL_LAYOUTS = {
+    'load_graduation': GRAD_LAYOUT,
+    'load_ready_grad': READY_GRAD_LAYOUT,
+    'load_act': ACT_LAYOUT,
+}
+
+
+def build_directory(frames):
+    """
+    One row per school key with the names from the first file that listed
+    it. `frames` must be in load order (grad, ready grad, ACT by year).
+    """
+    directory = pd.concat([frame[['key'] + NAME_FIELDS] for frame in frames], ignore_index=True)
+    directory = directory.drop_duplicates('key', keep='first').set_index('key')
+    directory['county'] = None
+    return directory
+
+
+def widen(frames, fields):
+    """
+    Join per-year frames side by side on key.
+    Columns are (year, field) plus (year, '_seen') marking which years listed the school.
+    """
+    return pd.concat(
+        {year: frame.set_index('key')[fields].assign(_seen=True) for frame, year in frames},
+        axis=1
+    )
+
+
+def match_cgr(cgr, matcher):
+    """Valid CGR rows with their matched school key and match kind (None when unmatched)"""
+    valid = (cgr['school_upper'] != 'NAN') & (cgr['district_upper'] != 'NAN')
+    cgr = cgr[valid].copy()
+    found = matcher.match_all(zip(cgr['district'], cgr['school']))
+    cgr['key'] = [key for key, _ in found]
+    cgr['match'] = [kind for _, kind in found]
+    return cgr
+
+
+def county_title(names):
+    """Title-case a column of county names, fixing Mc/De prefixes"""
+    return names.str.title().replace(COUNTY_NAMES)
+
+
+def cgr_by_school(matched):
+    """
+    Collapse the matched CGR rows to one row per school (unmatched rows are skipped).
+    A school matched exactly by name keeps only its exact rows; otherwise
+    later rows win per column, skipping suppressed years, like repeated dict updates.
+    Returns the widened rates and a frame of each school's county and ACT code.
+    """
+    matched = matched.dropna(subset=['key'])
+    exact = matched['match'] == 'exact'
+    matched = matched[exact | ~matched['key'].isin(matched.loc[exact, 'key'])]
+    grouped = matched.groupby('key', sort=False)
+    wide = grouped[CGR_YEARS].last()
+    wide = pd.concat({yr: pd.DataFrame({'rate': wide[yr], '_seen': wide[yr].notna()}) for yr in CGR_YEARS}, axis=1)
+    info = pd.DataFrame({
+        'county': county_title(grouped['county'].last().str.strip()),
+        'act_code': grouped['act_code'].last()
+    })
+    return wide, info
+
+
+def county_map(cgr):
+    """HS_District -> HS_County (upper-case), last row wins"""
+    valid = cgr[(cgr['district_upper'] != 'NAN') & (cgr['district_upper'] != '') & (cgr['county_upper'] != 'NAN')]
+    return dict(zip(valid['district_upper'], valid['county_upper']))
+
+
+def assign_counties(directory, matched_county, district_counties):
+    """
+    County from the matched CGR row, else the district's CGR county,
+    else the '<Name> County' prefix of the district name.
+    """
+    county = matched_county.reindex(directory.index)
+    district_upper = directory['district'].astype(str).str.strip().str.upper()
+
+    from_district = county_title(district_upper.map(district_counties))
+    county = county.fillna(from_district)
+
+    has_county = district_upper.str.contains('COUNTY', regex=False)
+    from_name = county_title(district_upper.str.split('COUNTY').str[0].str.strip())
+    county = county.fillna(from_name.where(has_county))
+
+    directory['county'] = county.astype(object).where(county.notna(), None)
+    return directory
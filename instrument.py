@@ -0,0 +1,165 @@
+"""
+Per-stage build instrumentation.
+
+Every pipeline stage runs inside `measure()`, which records wall time, CPU
+time, memory, and any counters the stage reports through `count()` (rows
+read, rows kept after the 'All Students' filter, cache hits, CGR match
+counts, ...). Stages in the process pool are measured in the worker, so
+CPU time and RSS belong to the process that did the work.
+
+Memory is per stage: the change in resident set size over the stage and
+how far the stage raised its process's RSS high-water mark (0 when an
+earlier stage already peaked higher). The high-water mark itself only
+ever rises, so it is reported per process, not as a stage figure.
+
+With tracing on, tracemalloc also records each stage's peak Python
+allocation; with a profile directory, each stage's cProfile stats are
+dumped to <dir>/<stage>.prof. Both slow the build down, so they are
+opt-in (--profile).
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_FILE = 'build_report.json'
+
+_counters = None
+
+
+def count(**values):
+    """Add to the current stage's counters (no-op outside a measured stage)"""
+    if _counters is None:
+        return
+    for name, value in values.items():
+        _counters[name] = _counters.get(name, 0) + int(value)
+
+
+def counted(func, *args):
+    """
+    Run func(*args) and return (result, the counters it reported); they
+    still count toward the current stage
+    """
+    global _counters
+    outer = _counters
+    _counters = {}
+    try:
+        result = func(*args)
+    finally:
+        counts, _counters = _counters, outer
+        if outer is not None:
+            count(**counts)
+    return result, counts
+
+
+def rss_mb():
+    """Current resident set size (None where /proc isn't available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def peak_rss_mb():
+    """The process's RSS high-water mark"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def profile_path(profile_dir, name):
+    return os.path.join(profile_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', name) + '.prof')
+
+
+def measure(name, func, args, profile_dir=None, trace_memory=False):
+    """Run func(*args); returns (result, stats dict)"""
+    global _counters
+    outer = _counters
+    _counters = {}
+
+    profiler = cProfile.Profile() if profile_dir else None
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+
+    rss = rss_mb()
+    peak = peak_rss_mb()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        if profiler:
+            result = profiler.runcall(func, *args)
+        else:
+            result = func(*args)
+    finally:
+        stats = {
+            'wall_s': round(time.perf_counter() - wall, 4),
+            'cpu_s': round(time.process_time() - cpu, 4),
+            'rss_mb': rss_mb(),
+            'process_peak_rss_mb': peak_rss_mb(),
+            'pid': os.getpid(),
+        }
+        stats['rss_delta_mb'] = None if rss is None or stats['rss_mb'] is None else round(stats['rss_mb'] - rss, 1)
+        stats['peak_rss_growth_mb'] = None if peak is None else round(stats['process_peak_rss_mb'] - peak, 1)
+        if trace_memory:
+            stats['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        if tracing:
+            tracemalloc.stop()
+        if profiler:
+            os.makedirs(profile_dir, exist_ok=True)
+            stats['profile'] = profile_path(profile_dir, name)
+            profiler.dump_stats(stats['profile'])
+        stats['counters'] = _counters
+        _counters = outer
+
+    return result, stats
+
+
+def build_report(stage_stats, wall_s, cpu_s, **extra):
+    """Whole-build report: totals plus each stage's stats, in completion order"""
+    counters = {}
+    for stats in stage_stats.values():
+        for name, value in stats['counters'].items():
+            counters[name] = counters.get(name, 0) + value
+    return {
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        **extra,
+        'total': {
+            'wall_s': round(wall_s, 4),
+            # Main process plus the workers' stage CPU time
+            'cpu_s': round(cpu_s + sum(s['cpu_s'] for s in stage_stats.values() if s['pid'] != os.getpid()), 4),
+            # Highest RSS high-water mark of any process that ran a stage
+            'peak_rss_mb': max((s['process_peak_rss_mb'] or 0 for s in stage_stats.values()), default=None),
+            'counters': counters,
+        },
+        'stages': stage_stats,
+    }
+
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def print_timings(report, limit=8):
+    stages = sorted(report['stages'].items(), key=lambda item: item[1]['wall_s'], reverse=True)
+    print(f"\nSLOWEST STAGES (total {report['total']['wall_s']:.2f}s wall, {report['total']['cpu_s']:.2f}s CPU):")
+    for name, stats in stages[:limit]:
+        print(f"  {name:<28}{stats['wall_s']:>8.2f}s wall{stats['cpu_s']:>8.2f}s CPU"
+              f"{stats['rss_delta_mb'] or 0:>+9.1f} MB RSS")
@@ -0,0 +1,242 @@
+"""
+"Similar schools": the k nearest peers of every school by metric profile.
+
+Each school is a vector of its latest graduation, Ready Grad, college-going
+and ACT values plus log cohort size, every feature standardized to zero
+mean and unit variance. Missing metrics are handled by pattern: a school
+missing some metrics is compared on the metrics it has, against every
+school that has at least those, and distances are RMS over the compared
+features so they read the same whichever features were used. Schools with
+fewer than MIN_FEATURES metrics get no peers.
+
+Neighbours come from a KD-tree built per pattern. Queries run a compact
+block of points at a time: leaves are compared a batch at a time in order
+of their box-to-box lower bound, and the search stops as soon as no
+remaining leaf can beat the block's current k-th distance, so only nearby
+leaves are compared in full.
+`blocked_neighbors` is the exhaustive all-pairs version, for checking and
+benchmarking.
+"""
+import math
+
+import numpy as np
+
+import shards
+
+FEATURES = ['ready_grad_rate', 'college_going_rate', 'act_composite', 'graduation_rate', 'cohort']
+DEFAULT_K = 5
+MIN_FEATURES = 3
+LEAF_SIZE = 64
+# Leaves compared per step of a query
+LEAF_BATCH = 8
+
+
+def latest_cohort(school):
+    for year in sorted(school['graduation'], reverse=True):
+        cohort = school['graduation'][year].get('cohort')
+        if cohort is not None:
+            return cohort
+    return None
+
+
+def feature_matrix(schools):
+    """(schools x FEATURES) array, NaN where missing, cohort as log(1 + size)"""
+    rows = []
+    for school in schools:
+        latest = school['latest']
+        cohort = latest_cohort(school)
+        rows.append([latest['ready_grad_rate'], latest['college_going_rate'], latest['act_composite'],
+                     latest['graduation_rate'], None if cohort is None else math.log1p(cohort)])
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURES))
+
+
+def standardize(matrix):
+    """Columns to zero mean / unit variance over their present values (NaN stays NaN)"""
+    present = ~np.isnan(matrix)
+    counts = present.sum(axis=0)
+    mean = np.where(counts > 0, np.nansum(matrix, axis=0) / np.maximum(counts, 1), 0.0)
+    centered = matrix - mean
+    std = np.sqrt(np.where(counts > 0, np.nansum(centered ** 2, axis=0) / np.maximum(counts, 1), 0.0))
+    return centered / np.where(std > 0, std, 1.0)
+
+
+def _merge(best_d, best_i, dist, idx, k):
+    """
+    Keep the k smallest of the current best and a new (queries x candidates)
+    block, ties at the k-th distance going to the lower index
+    """
+    d = np.concatenate([best_d, dist], axis=1)
+    i = np.concatenate([best_i, np.broadcast_to(idx, dist.shape)], axis=1)
+    if d.shape[1] <= k:
+        return d, i
+    part = np.argpartition(d, k - 1, axis=1)[:, :k]
+    kept_d = np.take_along_axis(d, part, axis=1)
+    kept_i = np.take_along_axis(i, part, axis=1)
+
+    # argpartition breaks ties at the boundary arbitrarily; redo those rows exactly
+    kth = kept_d.max(axis=1, keepdims=True)
+    ambiguous = np.flatnonzero((d == kth).sum(axis=1) > (kept_d == kth).sum(axis=1))
+    for row in ambiguous.tolist():
+        order = np.lexsort((i[row], d[row]))[:k]
+        kept_d[row], kept_i[row] = d[row, order], i[row, order]
+    return kept_d, kept_i
+
+
+def _sorted(best_d, best_i):
+    """Order each row by (distance, index)"""
+    order = np.lexsort((best_i, best_d), axis=1)
+    return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+
+def _sq_distances(queries, points):
+    diff = queries[:, None, :] - points[None, :, :]
+    return np.einsum('ijk,ijk->ij', diff, diff)
+
+
+class KDTree:
+    """Median-split KD-tree over the rows of `points`, queried a leaf at a time"""
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        n = len(self.points)
+        self.order = np.arange(n)
+        self.leaves = []
+
+        stack = [(0, n)]
+        while stack:
+            start, stop = stack.pop()
+            if stop - start <= leaf_size:
+                self.leaves.append((start, stop))
+                continue
+            block = self.points[self.order[start:stop]]
+            dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            mid = (stop - start) // 2
+            part = np.argpartition(block[:, dim], mid)
+            self.order[start:stop] = self.order[start:stop][part]
+            stack.append((start + mid, stop))
+            stack.append((start, start + mid))
+
+        self.starts = [a for a, _ in self.leaves]
+        self.stops = [b for _, b in self.leaves]
+        self.lo = np.array([self.points[self.order[a:b]].min(axis=0) for a, b in self.leaves])
+        self.hi = np.array([self.points[self.order[a:b]].max(axis=0) for a, b in self.leaves])
+
+    def query(self, queries, k, exclude=None, batch=LEAF_BATCH):
+        """
+        (squared distances, point indices) of the k nearest points to every
+        query row, nearest first. `exclude` gives, per query, a point index
+        to skip (the query itself) or -1.
+        """
+        queries = np.asarray(queries, dtype=np.float64)
+        best_d = np.full((len(queries), k), np.inf)
+        best_i = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(queries) == 0 or len(self.points) == 0:
+            return best_d, best_i
+
+        # Queries are blocked by a tree of their own so each block is compact
+        blocks = KDTree(queries, self.leaf_size)
+        for start, stop in blocks.leaves:
+            rows = blocks.order[start:stop]
+            block = queries[rows]
+            skip = exclude[rows] if exclude is not None else np.full(len(rows), -1)
+            d, i = best_d[rows], best_i[rows]
+
+            # The leaves nearest the block's box give every point a first k-th distance
+            gap = np.maximum(0, np.maximum(self.lo - block.max(axis=0), block.min(axis=0) - self.hi))
+            box_bounds = np.einsum('ij,ij->i', gap, gap)
+            nearest = np.argsort(box_bounds, kind='stable')
+            d, i = self._compare(block, skip, nearest[:batch], d, i, k)
+
+            # Only leaves within the worst k-th distance can still matter; bound
+            # those per point and visit them nearest first
+            rest = nearest[batch:]
+            rest = rest[box_bounds[rest] <= d[:, -1].max()]
+            if len(rest):
+                gap = np.maximum(0, np.maximum(self.lo[rest][None] - block[:, None], block[:, None] - self.hi[rest][None]))
+                bounds = np.einsum('ijk,ijk->ij', gap, gap)
+                order = np.argsort(bounds.min(axis=0), kind='stable')
+                for first in range(0, len(order), batch):
+                    cols = order[first:first + batch]
+                    if bounds[:, cols[0]].min() > d[:, -1].max():
+                        break
+                    # Points whose k-th distance one of these leaves could still beat
+                    active = np.flatnonzero((bounds[:, cols] <= d[:, -1:]).any(axis=1))
+                    if len(active):
+                        d[active], i[active] = self._compare(block[active], skip[active], rest[cols],
+                                                             d[active], i[active], k)
+            best_d[rows], best_i[rows] = d, i
+        return best_d, best_i
+
+    def _compare(self, block, skip, leaves, d, i, k):
+        """Merge the points of `leaves` into the block's sorted k best"""
+        idx = np.concatenate([self.order[self.starts[leaf]:self.stops[leaf]] for leaf in leaves.tolist()])
+        dist = _sq_distances(block, self.points[idx])
+        dist[skip[:, None] == idx[None, :]] = np.inf
+        return _sorted(*_merge(d, i, dist, idx, k))
+
+
+def blocked_neighbors(queries, points, k, exclude=None, block_size=512):
+    """All-pairs k nearest neighbours, `block_size` queries at a time (same result as KDTree.query)"""
+    best_d = np.full((len(queries), k), np.inf)
+    best_i = np.full((len(queries), k), -1, dtype=np.int64)
+    idx = np.arange(len(points))
+    for start in range(0, len(queries), block_size):
+        rows = slice(start, start + block_size)
+        dist = _sq_distances(queries[rows], points)
+        if exclude is not None:
+            dist[exclude[rows][:, None] == idx[None, :]] = np.inf
+        best_d[rows], best_i[rows] = _sorted(*_merge(best_d[rows], best_i[rows], dist, idx, k))
+    return best_d, best_i
+
+
+def nearest_peers(matrix, k=DEFAULT_K, min_features=MIN_FEATURES, search=None):
+    """
+    k nearest schools for every row of a standardized feature matrix.
+    Returns (positions, distances, patterns): (n x k) arrays, -1 / NaN where
+    a school has fewer peers, and the number of missing-metric patterns.
+    `search(queries, points, k, exclude)` defaults to a KD-tree over the points.
+    """
+    n = len(matrix)
+    positions = np.full((n, k), -1, dtype=np.int64)
+    distances = np.full((n, k), np.nan)
+    present = ~np.isnan(matrix)
+
+    patterns = {}
+    for row, mask in enumerate(present):
+        if mask.sum() >= min_features:
+            patterns.setdefault(tuple(mask.tolist()), []).append(row)
+
+    for pattern, rows in patterns.items():
+        dims = np.flatnonzero(pattern)
+        candidates = np.flatnonzero(present[:, dims].all(axis=1))
+        points = matrix[np.ix_(candidates, dims)]
+        queries = matrix[np.ix_(rows, dims)]
+        # Where each query sits among the candidates, to skip itself
+        exclude = np.searchsorted(candidates, rows)
+        if search is None:
+            d, i = KDTree(points).query(queries, k, exclude)
+        else:
+            d, i = search(queries, points, k, exclude)
+        found = np.isfinite(d)
+        positions[rows] = np.where(found, candidates[np.maximum(i, 0)], -1)
+        distances[rows] = np.where(found, np.sqrt(d / len(dims)), np.nan)
+    return positions, distances, len(patterns)
+
+
+def build_peers(schools, k=DEFAULT_K):
+    """The JSON-serializable peer list of every school, keyed by shard id"""
+    ids = shards.shard_ids(schools)
+    positions, distances, patterns = nearest_peers(standardize(feature_matrix(schools)), k)
+    peers = {}
+    for row, shard in enumerate(ids):
+        peers[shard] = [{'id': ids[p], 'school': schools[p]['school'], 'county': schools[p]['county'],
+                         'flight_score': schools[p]['flight_score'], 'distance': round(float(d), 3)}
+                        for p, d in zip(positions[row].tolist(), distances[row].tolist()) if p >= 0]
+    return {
+        'features': FEATURES,
+        'k': k,
+        'min_features': MIN_FEATURES,
+        'patterns': patterns,
+        'schools': peers
+    }
@@ -0,0 +1,89 @@
+"""
+Small dependency-aware stage scheduler for the build.
+
+Stages are added in order with the names of the stages they depend on
+(their results are passed in) and, optionally, of stages they must merely
+run `after`. A stage runs as soon as both have finished; stages marked
+`pool=True` (the independent workbook loads) run concurrently in a process
+pool while the main process carries on with whatever else is ready.
+
+Every stage is run through instrument.measure(); the per-stage stats end up
+in `Pipeline.stats`.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import instrument
+
+
+class Stage:
+    def __init__(self, name, func, args=(), deps=(), pool=False, after=()):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = tuple(deps)
+        self.pool = pool
+        self.after = tuple(after)
+
+    def arguments(self, results):
+        """args followed by the dependency results, dependencies in declared order"""
+        return self.args + tuple(results[dep] for dep in self.deps)
+
+
+class Pipeline:
+    def __init__(self, jobs=None, profile_dir=None, trace_memory=False):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.stats = {}
+
+    def add(self, name, func, args=(), deps=(), pool=False, after=()):
+        """`after` stages run first but, unlike `deps`, their results aren't passed to func"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [dep for dep in tuple(deps) + tuple(after) if dep not in self.stages]
+        if missing:
+            # Dependencies must already be declared, which also rules out cycles
+            raise ValueError(f"Stage {name} depends on unknown stage(s): {', '.join(missing)}")
+        self.stages[name] = Stage(name, func, args, deps, pool, after)
+        return self
+
+    def run(self):
+        """Run every stage and return {stage name: result}"""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+
+        use_pool = self.jobs > 1 and any(stage.pool for stage in pending.values())
+        executor = ProcessPoolExecutor(max_workers=self.jobs) if use_pool else None
+
+        try:
+            while pending or running:
+                ready = [stage for stage in pending.values()
+                         if all(dep in results for dep in stage.deps + stage.after)]
+
+                for stage in ready:
+                    if stage.pool and executor:
+                        del pending[stage.name]
+                        future = executor.submit(instrument.measure, stage.name, stage.func, stage.arguments(results),
+                                                 self.profile_dir, self.trace_memory)
+                        running[future] = stage.name
+
+                local = [stage for stage in ready if not (stage.pool and executor)]
+                if local:
+                    stage = local[0]
+                    del pending[stage.name]
+                    results[stage.name], self.stats[stage.name] = instrument.measure(
+                        stage.name, stage.func, stage.arguments(results), self.profile_dir, self.trace_memory)
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name], self.stats[name] = future.result()
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+        return results
@@ -0,0 +1,208 @@
+"""
+Indexed, in-process queries over the after-graduation dataset.
+
+    schools = SchoolIndex.load('tennessee-after-graduation-data.json')
+    schools.get('franklin-high-school')
+    schools.top('flight_score', 5, county='Williamson')
+    schools.range('act_composite', 21, None)
+    schools.filter(county='Davidson', tier='strong', ready_grad_rate=(50, None))
+
+The file is loaded once; each index (slug and code maps, county/district
+groups, per-metric sorted arrays, tier buckets) is only built the first
+time a query needs it. Results are the school objects themselves, and ties
+keep file order, as the build's stable sorts do.
+"""
+import heapq
+import json
+from functools import cached_property
+
+import numpy as np
+
+# Queryable numbers: flight_score plus every `latest` metric
+LATEST_METRICS = ['graduation_rate', 'ready_grad_rate', 'college_going_rate', 'act_composite']
+METRICS = ['flight_score'] + LATEST_METRICS
+
+
+def metric_value(school, metric):
+    if metric == 'flight_score':
+        return school['flight_score']
+    return school['latest'][metric]
+
+
+def tier_key(school):
+    """'elite', 'strong', ... 'na', from the tier's CSS class"""
+    return school['flight_tier_class'][len('tier-'):]
+
+
+class SchoolIndex:
+    def __init__(self, data):
+        self.data = data
+        self.schools = data['schools']
+        self._sorted = {}
+        self._descending = {}
+        self._columns = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.schools)
+
+    # ---------- lazy indexes ----------
+    @cached_property
+    def slugs(self):
+        """slug -> positions (a few slugs, like 'central-high-school', repeat)"""
+        index = {}
+        for i, school in enumerate(self.schools):
+            index.setdefault(school['slug'], []).append(i)
+        return index
+
+    @cached_property
+    def codes(self):
+        return {(s['system_code'], s['school_code']): i for i, s in enumerate(self.schools)}
+
+    @cached_property
+    def counties(self):
+        return self._group('county')
+
+    @cached_property
+    def districts(self):
+        return self._group('district')
+
+    @cached_property
+    def tiers(self):
+        index = {}
+        for i, school in enumerate(self.schools):
+            index.setdefault(tier_key(school), []).append(i)
+        return index
+
+    def _group(self, field):
+        index = {}
+        for i, school in enumerate(self.schools):
+            index.setdefault(school[field], []).append(i)
+        return index
+
+    def column(self, metric):
+        """Metric values in file order, NaN where missing"""
+        if metric not in self._columns:
+            if metric not in METRICS:
+                raise KeyError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+            self._columns[metric] = np.array([np.nan if v is None else v for v in
+                                              (metric_value(school, metric) for school in self.schools)])
+        return self._columns[metric]
+
+    def sorted_metric(self, metric):
+        """(values ascending, their positions) over the schools that have the metric"""
+        if metric not in self._sorted:
+            column = self.column(metric)
+            positions = np.flatnonzero(~np.isnan(column))
+            values = column[positions]
+            order = np.lexsort((positions, values))
+            self._sorted[metric] = (values[order], positions[order])
+        return self._sorted[metric]
+
+    # ---------- lookups ----------
+    def get(self, slug):
+        """The school with this slug (the first one if the slug repeats), or None"""
+        positions = self.slugs.get(slug)
+        return self.schools[positions[0]] if positions else None
+
+    def get_all(self, slug):
+        return [self.schools[i] for i in self.slugs.get(slug, [])]
+
+    def by_code(self, system_code, school_code):
+        i = self.codes.get((int(system_code), int(school_code)))
+        return None if i is None else self.schools[i]
+
+    def county(self, name):
+        return [self.schools[i] for i in self.counties.get(name, [])]
+
+    def district(self, name):
+        return [self.schools[i] for i in self.districts.get(name, [])]
+
+    def tier(self, key):
+        return [self.schools[i] for i in self.tiers.get(key, [])]
+
+    # ---------- range / top-k ----------
+    def _range_positions(self, metric, low=None, high=None):
+        values, positions = self.sorted_metric(metric)
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return positions[start:stop]
+
+    def range(self, metric, low=None, high=None):
+        """Schools with low <= metric <= high (either bound optional), ascending"""
+        return [self.schools[i] for i in self._range_positions(metric, low, high).tolist()]
+
+    def top(self, metric, k, county=None, district=None, tier=None, ascending=False):
+        """
+        The k best (highest unless `ascending`) schools by metric, optionally
+        within a county / district / tier. Schools without the metric are skipped.
+        """
+        if k <= 0:
+            return []
+        if county is None and district is None and tier is None:
+            values, positions = self.sorted_metric(metric)
+            if ascending:
+                return [self.schools[i] for i in positions[:k].tolist()]
+            if metric not in self._descending:
+                # Highest first, ties in file order
+                self._descending[metric] = positions[np.lexsort((positions, -values))]
+            return [self.schools[i] for i in self._descending[metric][:k].tolist()]
+
+        candidates = self._candidates(county, district, tier)
+        scored = [(metric_value(self.schools[i], metric), i) for i in candidates]
+        scored = [(v, i) for v, i in scored if v is not None]
+        if ascending:
+            best = heapq.nsmallest(k, scored)
+        else:
+            best = heapq.nsmallest(k, scored, key=lambda item: (-item[0], item[1]))
+        return [self.schools[i] for _, i in best]
+
+    # ---------- combined filters ----------
+    def _candidates(self, county=None, district=None, tier=None):
+        """Positions matching every given group, in file order"""
+        sets = []
+        if county is not None:
+            sets.append(self.counties.get(county, []))
+        if district is not None:
+            sets.append(self.districts.get(district, []))
+        if tier is not None:
+            sets.append(self.tiers.get(tier, []))
+        if not sets:
+            return range(len(self.schools))
+        sets.sort(key=len)
+        if len(sets) == 1:
+            return sets[0]
+        others = [set(s) for s in sets[1:]]
+        return [i for i in sets[0] if all(i in other for other in others)]
+
+    def filter(self, county=None, district=None, tier=None, **ranges):
+        """
+        Schools matching every condition, in file order. Ranges are given as
+        metric=(low, high), either bound None:
+            filter(county='Knox', act_composite=(21, None))
+        """
+        ranges = list(ranges.items())
+        if county is not None or district is not None or tier is not None:
+            candidates = np.asarray(self._candidates(county, district, tier), dtype=np.int64)
+        elif ranges:
+            # Start from the narrowest range, then check the rest against the columns
+            spans = [self._range_positions(metric, low, high) for metric, (low, high) in ranges]
+            narrowest = min(range(len(spans)), key=lambda j: len(spans[j]))
+            candidates = np.sort(spans[narrowest])
+            del ranges[narrowest]
+        else:
+            return list(self.schools)
+
+        for metric, (low, high) in ranges:
+            values = self.column(metric)[candidates]
+            keep = ~np.isnan(values)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            candidates = candidates[keep]
+        return [self.schools[i] for i in candidates.tolist()]
@@ -0,0 +1,185 @@
+"""
+Rankings, percentiles, tier counts and leaderboards for the final school list.
+
+Everything is computed from one set of columns built in a single pass over
+the schools (flight score, the `latest` metrics, Ready Grad change, tier
+and county / district ids):
+
+    county / district / state rank and total   one grouped lexsort each
+    percentiles of every metric                 one sort + searchsorted each
+    tier counts                                 one bincount
+    leaderboards and top improvers              partial selection (top_k)
+
+Ranks are by flight score, highest first, with ties kept in list order as
+the build's stable sorts did; schools without a score get None. A new
+leaderboard is one more top_k call over a column that already exists.
+
+Only the county rank goes into the school records. District / state ranks
+and percentiles shift for every school whenever any one changes, so they
+are kept out of the records (and their content hashes) and published as a
+separate table keyed by shard id.
+"""
+import numpy as np
+
+import shards
+from flight_engine import TIER_KEYS
+from query import METRICS, metric_value, tier_key
+
+BADGE_RANK = 3          # county ranks that get the firefly badge
+TOP_IMPROVERS = 15
+LEADERBOARD_SIZE = 10
+
+
+def factorize(values):
+    """Integer id per value, in order of first appearance"""
+    ids = {}
+    return np.array([ids.setdefault(value, len(ids)) for value in values], dtype=np.int64)
+
+
+def group_ranks(values, groups):
+    """
+    (rank, total) arrays: 1-based rank of each value within its group,
+    highest first with ties in input order, and the number of ranked values
+    in the group. Both are 0 where the value is NaN.
+    """
+    present = ~np.isnan(values)
+    order = np.lexsort((np.where(present, -values, np.inf), groups))
+    sorted_groups = groups[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    starts = np.flatnonzero(new_group)
+    position = np.arange(len(order)) - starts[np.cumsum(new_group) - 1]
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = position + 1
+    totals = np.bincount(groups, weights=present, minlength=groups.max() + 1 if len(groups) else 0)
+    return np.where(present, ranks, 0), np.where(present, totals[groups].astype(np.int64), 0)
+
+
+def percentiles(values):
+    """Mid-rank percentile (0-100) of each value among the present ones, -1 where NaN"""
+    present = ~np.isnan(values)
+    ordered = np.sort(values[present])
+    if not len(ordered):
+        return np.full(len(values), -1, dtype=np.int64)
+    filled = np.where(present, values, 0)
+    below = np.searchsorted(ordered, filled, side='left')
+    at_or_below = np.searchsorted(ordered, filled, side='right')
+    pct = np.round(100 * (below + at_or_below) / (2 * len(ordered))).astype(np.int64)
+    return np.where(present, pct, -1)
+
+
+def top_k(values, k):
+    """
+    Positions of the k highest values, highest first, ties in input order
+    (NaN skipped). A partial selection: only values tied with or above the
+    k-th are sorted.
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    if len(positions) > k > 0:
+        kth = np.partition(values[positions], len(positions) - k)[len(positions) - k]
+        positions = positions[values[positions] >= kth]
+    order = np.lexsort((positions, -values[positions]))
+    return positions[order][:k]
+
+
+class Rankings:
+    def __init__(self, schools):
+        self.schools = schools
+        self.columns = {metric: np.array([np.nan if v is None else v for v in
+                                          (metric_value(school, metric) for school in schools)], dtype=np.float64)
+                        for metric in METRICS}
+        self.change = np.array([np.nan if s['trend']['change'] is None else s['trend']['change'] for s in schools],
+                               dtype=np.float64)
+        self.counties = factorize(s['county'] for s in schools)
+        self.districts = factorize(s['district'] for s in schools)
+        tier_index = {key: i for i, key in enumerate(TIER_KEYS)}
+        self.tiers = np.array([tier_index[tier_key(s)] for s in schools], dtype=np.int64)
+
+    def apply(self):
+        """Write the county rank and badge into every school"""
+        county_rank, county_total = group_ranks(self.columns['flight_score'], self.counties)
+        for school, c_rank, c_total in zip(self.schools, county_rank.tolist(), county_total.tolist()):
+            school['county_rank'] = c_rank or None
+            school['county_total'] = c_total or None
+            school['is_top_county'] = 0 < c_rank <= BADGE_RANK
+
+    def table(self):
+        """District / state rank and total plus metric percentiles of every school, by shard id"""
+        scores = self.columns['flight_score']
+        district_rank, district_total = group_ranks(scores, self.districts)
+        state_rank, state_total = group_ranks(scores, np.zeros(len(scores), dtype=np.int64))
+        pct = {metric: percentiles(column).tolist() for metric, column in self.columns.items()}
+
+        columns = zip(shards.shard_ids(self.schools), district_rank.tolist(), district_total.tolist(),
+                      state_rank.tolist(), state_total.tolist())
+        table = {}
+        for i, (shard, d_rank, d_total, s_rank, s_total) in enumerate(columns):
+            table[shard] = {
+                'district_rank': d_rank or None,
+                'district_total': d_total or None,
+                'state_rank': s_rank or None,
+                'state_total': s_total or None,
+                'percentiles': {metric: None if values[i] < 0 else values[i] for metric, values in pct.items()}
+            }
+        return table
+
+    def tier_counts(self):
+        counts = np.bincount(self.tiers, minlength=len(TIER_KEYS)).tolist()
+        return dict(zip(TIER_KEYS, counts))
+
+    def flight_score_stats(self):
+        scores = [s for s in self.columns['flight_score'].tolist() if s == s]
+        if not scores:
+            return {'average': None, 'max': None, 'min': None, 'tier_counts': self.tier_counts()}
+        return {
+            'average': round(sum(scores) / len(scores), 1),
+            'max': round(max(scores), 1),
+            'min': round(min(scores), 1),
+            'tier_counts': self.tier_counts()
+        }
+
+    def top(self, metric, k=LEADERBOARD_SIZE):
+        """The k schools highest on a metric"""
+        return [self.schools[i] for i in top_k(self.columns[metric], k).tolist()]
+
+    def top_improvers(self, k=TOP_IMPROVERS):
+        """Biggest positive Ready Grad changes"""
+        change = np.where(self.change > 0, self.change, np.nan)
+        improvers = []
+        for i in top_k(change, k).tolist():
+            school = self.schools[i]
+            improvers.append({
+                'school': school['school'],
+                'slug': school['slug'],
+                'county': school['county'],
+                'district': school['district'],
+                'change': school['trend']['change'],
+                'flight_score': school['flight_score'],
+                'flight_tier': school['flight_tier'],
+                'rg_2023': school['ready_grad'].get('2023', {}).get('rate'),
+                'rg_2025': school['ready_grad'].get('2025', {}).get('rate')
+            })
+        return improvers
+
+    def leaderboards(self, k=LEADERBOARD_SIZE):
+        """Top k schools statewide on each metric"""
+        return {metric: [{'slug': s['slug'], 'school': s['school'], 'county': s['county'],
+                          'value': metric_value(s, metric)} for s in self.top(metric, k)]
+                for metric in METRICS}
+
+
+def rank(schools):
+    """
+    Rank a name-sorted school list in place and summarize it:
+    {'schools', 'top_improvers', 'flight_score', 'leaderboards', 'rankings'}
+    """
+    rankings = Rankings(schools)
+    rankings.apply()
+    return {
+        'schools': schools,
+        'rankings': rankings.table(),
+        'top_improvers': rankings.top_improvers(),
+        'flight_score': rankings.flight_score_stats(),
+        'leaderboards': rankings.leaderboards()
+    }
@@ -0,0 +1,218 @@
+"""
+Array-backed school x metric x year model.
+
+Every numeric field of every metric lives in one float64 cube indexed by
+(school, field, year) with NaN for suppressed or missing cells, plus a
+boolean (school, metric, year) mask of which years listed the school at all.
+Names are stored once in a string table and referenced by integer ids.
+
+State averages, latest-available values and year-over-year deltas are
+single array reductions over the cube. The nested per-year dicts of the JSON
+schema are only built by `records()` at the output edge.
+"""
+import numpy as np
+
+import ingest
+
+# Metric groups in JSON order, with their fields
+METRICS = {
+    'graduation': list(ingest.GRAD_FIELDS),
+    'ready_grad': list(ingest.READY_GRAD_FIELDS),
+    'college_going': ['rate'],
+    'act': list(ingest.ACT_FIELDS),
+}
+
+NAME_COLUMNS = ['district', 'school', 'county']
+
+
+class SchoolCube:
+    def __init__(self, keys, system_codes, school_codes, strings, name_ids, years, values, seen):
+        self.keys = keys
+        self.system_codes = system_codes
+        self.school_codes = school_codes
+        self.strings = strings
+        self.name_ids = name_ids
+        self.years = years
+        self.values = values
+        self.seen = seen
+
+        self.key_index = {key: i for i, key in enumerate(keys)}
+        self.year_index = {year: i for i, year in enumerate(years)}
+        self.fields = [(metric, field) for metric, fields in METRICS.items() for field in fields]
+        self.field_index = {pair: i for i, pair in enumerate(self.fields)}
+        self.metric_index = {metric: i for i, metric in enumerate(METRICS)}
+
+    @classmethod
+    def from_frames(cls, directory, metrics):
+        """
+        Build from the ingest directory (indexed by key, counties assigned)
+        and the widened per-metric frames.
+        """
+        keys = directory.index.tolist()
+        years = sorted({year for wide in metrics.values() for year in wide.columns.get_level_values(0)})
+
+        strings = []
+        string_ids = {}
+        name_ids = np.full((len(keys), len(NAME_COLUMNS)), -1, dtype=np.int32)
+        for col, column in enumerate(NAME_COLUMNS):
+            for row, name in enumerate(directory[column].tolist()):
+                if name is None or name != name:
+                    continue
+                if name not in string_ids:
+                    string_ids[name] = len(strings)
+                    strings.append(name)
+                name_ids[row, col] = string_ids[name]
+
+        fields = [(metric, field) for metric, names in METRICS.items() for field in names]
+        values = np.full((len(keys), len(fields), len(years)), np.nan)
+        seen = np.zeros((len(keys), len(METRICS), len(years)), dtype=bool)
+
+        for m, metric in enumerate(METRICS):
+            wide = metrics[metric].reindex(directory.index)
+            for year in wide.columns.get_level_values(0).unique():
+                y = years.index(year)
+                block = wide[year]
+                seen[:, m, y] = block['_seen'].fillna(False).to_numpy(dtype=bool)
+                for field in METRICS[metric]:
+                    values[:, fields.index((metric, field)), y] = block[field].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        return cls(
+            np.array(keys, dtype=object),
+            directory['system_code'].to_numpy(dtype=np.int64),
+            directory['school_code'].to_numpy(dtype=np.int64),
+            strings,
+            name_ids,
+            years,
+            values,
+            seen,
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ---------- names ----------
+    def names(self, column):
+        """Object array of one name column (district/school/county), None where missing"""
+        table = np.array(self.strings + [None], dtype=object)
+        return table[self.name_ids[:, NAME_COLUMNS.index(column)]]
+
+    # ---------- reductions ----------
+    def series(self, metric, field):
+        """(school, year) view of one field"""
+        return self.values[:, self.field_index[(metric, field)], :]
+
+    def get(self, metric, field, year):
+        if year not in self.year_index:
+            return np.full(len(self), np.nan)
+        return self.series(metric, field)[:, self.year_index[year]]
+
+    def latest(self, metric, field, years):
+        """Most recent non-null value among `years` for every school (NaN if none)"""
+        cols = [self.year_index[year] for year in years if year in self.year_index]
+        if not cols:
+            return np.full(len(self), np.nan)
+        block = self.series(metric, field)[:, cols]
+        present = ~np.isnan(block)
+        last = len(cols) - 1 - np.argmax(present[:, ::-1], axis=1)
+        picked = block[np.arange(len(self)), last]
+        return np.where(present.any(axis=1), picked, np.nan)
+
+    def delta(self, metric, field, start, end):
+        """end-year minus start-year value per school (NaN if either is missing)"""
+        return self.get(metric, field, end) - self.get(metric, field, start)
+
+    def totals(self, metric, field, rows=None):
+        """
+        {year: (sum in integer tenths, count)} of the non-null values, for
+        all schools or just `rows`. See incremental.RunningAverages.
+        """
+        block = self.series(metric, field)
+        if rows is not None:
+            block = block[rows]
+        present = ~np.isnan(block)
+        tenths = np.where(present, np.round(block * 10), 0).sum(axis=0)
+        counts = present.sum(axis=0)
+        return {year: (int(tenths[y]), int(counts[y])) for year, y in self.year_index.items() if counts[y]}
+
+    # ---------- diffing ----------
+    def diff(self, previous):
+        """
+        Compare against an earlier cube, matching rows by key.
+        Returns (added, removed, changed keys); changed maps each key to the
+        parts that differ ('act', 'county', 'codes', ...).
+        """
+        added = [key for key in self.keys if key not in previous.key_index]
+        removed = [key for key in previous.keys if key not in self.key_index]
+
+        common = [key for key in self.keys if key in previous.key_index]
+        if not common:
+            return added, removed, {}
+        rows = np.array([self.key_index[key] for key in common])
+        old_rows = np.array([previous.key_index[key] for key in common])
+
+        ours = self._align(self, rows, previous.years)
+        theirs = self._align(previous, old_rows, self.years)
+        same_value = (ours[0] == theirs[0]) | (np.isnan(ours[0]) & np.isnan(theirs[0]))
+        same_seen = ours[1] == theirs[1]
+
+        parts = {}
+        for metric, m in self.metric_index.items():
+            cols = [self.field_index[(metric, field)] for field in METRICS[metric]]
+            parts[metric] = ~(same_value[:, cols, :].all(axis=(1, 2)) & same_seen[:, m, :].all(axis=1))
+        for column in NAME_COLUMNS:
+            parts[column] = self.names(column)[rows] != previous.names(column)[old_rows]
+        parts['codes'] = ((self.system_codes[rows] != previous.system_codes[old_rows]) |
+                          (self.school_codes[rows] != previous.school_codes[old_rows]))
+
+        changed = {}
+        for i, key in enumerate(common):
+            fields = [part for part, flags in parts.items() if flags[i]]
+            if fields:
+                changed[key] = fields
+        return added, removed, changed
+
+    @staticmethod
+    def _align(cube, rows, other_years):
+        """values/seen for `rows`, on the union of both cubes' years"""
+        years = sorted(set(cube.years) | set(other_years))
+        values = np.full((len(rows), len(cube.fields), len(years)), np.nan)
+        seen = np.zeros((len(rows), len(METRICS), len(years)), dtype=bool)
+        for year, y in cube.year_index.items():
+            values[:, :, years.index(year)] = cube.values[rows, :, y]
+            seen[:, :, years.index(year)] = cube.seen[rows, :, y]
+        return values, seen
+
+    # ---------- output edge ----------
+    def records(self, rows, fields=METRICS):
+        """
+        Per-year metric dicts in the JSON schema for the given rows:
+        [{'graduation': {'2023': {'rate': .., 'cohort': ..}, ...}, ...}, ...]
+        `fields` maps each metric to the fields to emit, in order.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        values = self.values[rows].tolist()
+        seen = self.seen[rows].tolist()
+
+        layout = []
+        for metric, names in fields.items():
+            layout.append((metric, self.metric_index[metric],
+                           [(field, self.field_index[(metric, field)], field in ingest.INT_FIELDS) for field in names]))
+
+        result = []
+        for row_values, row_seen in zip(values, seen):
+            record = {}
+            for metric, m, fields in layout:
+                years = {}
+                for y, year in enumerate(self.years):
+                    if not row_seen[m][y]:
+                        continue
+                    years[year] = {field: _cell(row_values[f][y], integer) for field, f, integer in fields}
+                record[metric] = years
+            result.append(record)
+        return result
+
+
+def _cell(value, integer):
+    if value != value:
+        return None
+    return int(value) if integer else value
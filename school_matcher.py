@@ -0,0 +1,264 @@
+"""
+School matcher for TDOE files that identify schools by name only
+(e.g. the CGR by HS workbook), instead of by system/school code.
+
+Builds a normalized (district, school) index once so each lookup is a dict
+hit, and falls back to a trigram-indexed fuzzy match for near-miss names
+such as 'COCKE CO HIGH SCHOOL' vs 'Cocke County High School'.
+
+Rows are matched exactly first; a fuzzy match never takes a school another
+row matched exactly, and names that differ in a direction or ordinal word
+(North vs South, East Central vs Central) never match fuzzily.
+
+Names are looked up within the row's district, so a row whose district is
+spelled differently than in the directory finds nothing there (most of the
+unmatched CGR rows are Memphis-Shelby and Davidson County schools). Rows
+from a district the directory does not have fall back to the school name
+statewide, accepted only when no other directory school has that name and
+no other row claimed it; what still fails is listed per district in the
+report. A school is claimed by at most one non-exact match; later claims
+are reported as ambiguous.
+
+    python school_matcher.py        checks these rules on a small directory
+"""
+import re
+from difflib import SequenceMatcher
+
+# Abbreviations TDOE files use interchangeably in school names
+ALIASES = {
+    'HS': 'HIGH SCHOOL',
+    'H S': 'HIGH SCHOOL',
+    'MS': 'MIDDLE SCHOOL',
+    'CO': 'COUNTY',
+    'CNTY': 'COUNTY',
+    'SR': 'SENIOR',
+    'JR': 'JUNIOR',
+    'ACAD': 'ACADEMY',
+    'ST': 'SAINT',
+    'MT': 'MOUNT',
+    'CTR': 'CENTER',
+    'TECH': 'TECHNOLOGY',
+    '&': 'AND',
+}
+
+# Words that tell sibling schools apart; fuzzy names must agree on them
+DISTINCT_WORDS = {
+    'NORTH', 'SOUTH', 'EAST', 'WEST', 'CENTRAL',
+    'NORTHEAST', 'NORTHWEST', 'SOUTHEAST', 'SOUTHWEST',
+    'NORTHSIDE', 'SOUTHSIDE', 'EASTSIDE', 'WESTSIDE',
+    'UPPER', 'LOWER', 'FIRST', 'SECOND', 'THIRD', 'I', 'II', 'III', 'IV',
+}
+
+_alias_re = re.compile(r'\b(' + '|'.join(re.escape(a) for a in ALIASES if a != '&') + r')\b|&')
+
+
+def normalize_name(name):
+    """Upper-case, strip and collapse whitespace. None/NaN become ''"""
+    if name is None or name != name:
+        return ''
+    return ' '.join(str(name).upper().split())
+
+
+def fuzzy_form(name):
+    """Normalized name with punctuation dropped and aliases expanded"""
+    text = normalize_name(name)
+    text = re.sub(r"[.,'/()\-]", ' ', text)
+    text = ' '.join(text.split())
+    text = _alias_re.sub(lambda m: ALIASES[m.group(0)], text)
+    return ' '.join(text.split())
+
+
+def distinct_words(form):
+    return DISTINCT_WORDS.intersection(form.split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchoolMatcher:
+    """
+    Index of schools by normalized (district, school) name.
+
+    `schools` is the build's key -> school dict. Every lookup is recorded so
+    the build can report what matched exactly, fuzzily, by name statewide,
+    ambiguously or not at all.
+    """
+
+    def __init__(self, schools, threshold=0.88, margin=0.02):
+        self.threshold = threshold
+        self.margin = margin
+        self.exact = {}
+        self.fuzzy_names = {}
+        self.postings = {}
+        self.statewide = {}
+
+        for key, school in schools.items():
+            district = normalize_name(school['district'])
+            self.exact.setdefault((district, normalize_name(school['school'])), []).append(key)
+
+            form = fuzzy_form(school['school'])
+            self.fuzzy_names[key] = form
+            self.statewide.setdefault(form, []).append(key)
+            for gram in trigrams(form):
+                self.postings.setdefault((district, gram), []).append(key)
+        self.districts = {district for district, _ in self.exact}
+
+        self.matches = {'exact': 0, 'fuzzy': 0, 'statewide': 0}
+        self.fuzzy = []
+        self.unmatched = []
+        self.ambiguous = []
+
+    def match_all(self, pairs):
+        """
+        School key (or None) and match kind ('exact', 'fuzzy', 'statewide'
+        or None) for each (district, school) name pair. Exact matches are
+        taken first, so a fuzzy one can't claim a school matched exactly,
+        and a school already claimed by an earlier fuzzy or statewide match
+        makes any later claim on it ambiguous.
+        """
+        pairs = [(normalize_name(district), normalize_name(school)) for district, school in pairs]
+        found = [self._match_exact(district, school) for district, school in pairs]
+        exact = {key for key, _ in found if key is not None}
+        claimed = set(exact)
+
+        for i, (district, school) in enumerate(pairs):
+            if found[i][1] is not None:
+                continue
+            if district in self.districts:
+                found[i] = (self._match_fuzzy(district, school, exact, claimed), 'fuzzy')
+            else:
+                found[i] = (self._match_statewide(district, school, claimed), 'statewide')
+            if found[i][0] is not None:
+                claimed.add(found[i][0])
+        return [(key, kind if key is not None else None) for key, kind in found]
+
+    def match(self, district, school):
+        """Return the school key for a (district, school) name pair, or None"""
+        return self.match_all([(district, school)])[0][0]
+
+    def _ambiguous(self, district, school, candidates):
+        self.ambiguous.append({'district': district, 'school': school, 'candidates': candidates})
+
+    def _match_exact(self, district, school):
+        """(key, 'exact'), (None, 'ambiguous') for a name the district has twice, or (None, None)"""
+        keys = self.exact.get((district, school))
+        if not keys:
+            return None, None
+        if len(keys) > 1:
+            self._ambiguous(district, school, keys)
+            return None, 'ambiguous'
+        self.matches['exact'] += 1
+        return keys[0], 'exact'
+
+    def _match_statewide(self, district, school, claimed):
+        """A district the directory doesn't have: the school name, if unique in the whole directory"""
+        keys = self.statewide.get(fuzzy_form(school), [])
+        if len(keys) > 1 or (keys and keys[0] in claimed):
+            self._ambiguous(district, school, keys)
+            return None
+        if not keys:
+            self.unmatched.append({'district': district, 'school': school, 'known_district': False})
+            return None
+        self.matches['statewide'] += 1
+        return keys[0]
+
+    def _match_fuzzy(self, district, school, exact=(), claimed=()):
+        form = fuzzy_form(school)
+        grams = trigrams(form)
+        words = distinct_words(form)
+
+        shared = {}
+        for gram in grams:
+            for key in self.postings.get((district, gram), ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        # Only score candidates that share at least half the trigrams, agree
+        # on direction words and weren't matched exactly by another row
+        scored = []
+        for key, count in shared.items():
+            if count * 2 < len(grams) or key in exact:
+                continue
+            if distinct_words(self.fuzzy_names[key]) != words:
+                continue
+            score = SequenceMatcher(None, form, self.fuzzy_names[key]).ratio()
+            if score >= self.threshold:
+                scored.append((score, key))
+
+        if not scored:
+            self.unmatched.append({'district': district, 'school': school, 'known_district': True})
+            return None
+
+        scored.sort(reverse=True)
+        best_score, best_key = scored[0]
+        if len(scored) > 1 and best_score - scored[1][0] < self.margin:
+            self._ambiguous(district, school, [key for score, key in scored if best_score - score < self.margin])
+            return None
+        if best_key in claimed:
+            self._ambiguous(district, school, [best_key])
+            return None
+
+        self.matches['fuzzy'] += 1
+        self.fuzzy.append({'district': district, 'school': school, 'key': best_key, 'score': round(best_score, 3)})
+        return best_key
+
+    def report(self):
+        unknown_districts = {}
+        for row in self.unmatched:
+            if not row['known_district']:
+                unknown_districts[row['district']] = unknown_districts.get(row['district'], 0) + 1
+        return {
+            'exact': self.matches['exact'],
+            'fuzzy': self.matches['fuzzy'],
+            'statewide': self.matches['statewide'],
+            'unmatched': len(self.unmatched),
+            'ambiguous': len(self.ambiguous),
+            'fuzzy_matches': self.fuzzy,
+            'unmatched_rows': self.unmatched,
+            # Unmatched rows whose district name isn't in the directory, per district
+            'unknown_districts': dict(sorted(unknown_districts.items(), key=lambda item: -item[1])),
+            'ambiguous_rows': self.ambiguous
+        }
+
+
+def check():
+    """Regression checks for the matching rules above; raises AssertionError on failure"""
+    schools = {
+        '1-1': {'district': 'Knox County', 'school': 'Central High School'},
+        '2-1': {'district': 'Hamilton County', 'school': 'Central High School'},
+        '3-1': {'district': 'Shelby County', 'school': 'Central High School'},
+        '1-2': {'district': 'Knox County', 'school': 'East Central High School'},
+        '1-3': {'district': 'Knox County', 'school': 'Fulton High School'},
+        '1-4': {'district': 'Knox County', 'school': 'Twin High School'},
+        '1-5': {'district': 'Knox County', 'school': 'Twin High School'},
+        '4-1': {'district': 'Sullivan County', 'school': 'Sullivan East High School'},
+    }
+
+    def run(pairs):
+        matcher = SchoolMatcher(schools)
+        return matcher, matcher.match_all(pairs)
+
+    # A name several districts have is never matched statewide
+    _, found = run([('Hamilton County', 'CENTRAL HIGH SCHOOL'), ('MEMPHIS-SHELBY', 'CENTRAL HIGH SCHOOL')])
+    assert found == [('2-1', 'exact'), (None, None)], found
+
+    # A school claimed by a fuzzy match can't be claimed again statewide
+    matcher, found = run([('Knox County', 'FULTON HS'), ('ELSEWHERE', 'FULTON HIGH SCHOOL')])
+    assert found == [('1-3', 'fuzzy'), (None, None)], found
+    assert matcher.report()['ambiguous'] == 1
+
+    # Fuzzy matches skip exactly matched schools and sibling names
+    _, found = run([('Knox County', 'CENTRAL HIGH SCHOOL'), ('Knox County', 'CENTRAL HIGH SCHOOOL'),
+                    ('Knox County', 'EAST CENTRAL HS'), ('Sullivan County', 'SULLIVAN SOUTH HIGH SCHOOL')])
+    assert found == [('1-1', 'exact'), (None, None), ('1-2', 'fuzzy'), (None, None)], found
+
+    # A name a district has twice is ambiguous, not its first school
+    matcher, found = run([('Knox County', 'TWIN HIGH SCHOOL')])
+    assert found == [(None, None)], found
+    assert matcher.report()['exact'] == 0 and matcher.report()['ambiguous'] == 1
+
+
+if __name__ == '__main__':
+    check()
+    print('school_matcher: all checks passed')
@@ -0,0 +1,214 @@
+"""
+Search / autocomplete index over school, district and county names.
+
+The build writes it next to the output (<output>.search.json, plus .gz/.br):
+
+    aliases    abbreviation -> words, applied to names and queries alike
+               ('hs' -> 'high school', 'st' -> 'saint', ...)
+    docs       [shard id, school, district, county] per school
+    places     [name, [doc ids]] per distinct district / county name
+    tokens     every normalized word, sorted, so a prefix is a bisect range
+    names      doc ids whose school name has tokens[i]
+    place_ids  place ids whose name has tokens[i]
+    trigrams   '$ab', 'abc', 'bc$' ... -> ids of the tokens containing it
+
+A query is normalized the same way. Every word must match (a school name
+word, or its district / county); the last word may be a prefix. It may
+still be mid-typing, so it matches both as typed and, if it is an
+abbreviation, as its expansion ('st' finds 'Stewart' and 'Saint'). A word
+with no exact or prefix match falls back to the tokens sharing enough
+trigrams with it, scored by edit similarity, so 'frankln' still finds
+Franklin. Each step is a bisect or a few short posting lists, not a scan
+over the schools.
+
+    index = SearchIndex.load('tennessee-after-graduation-data.search.json')
+    index.search('franklin hs')
+"""
+import json
+import re
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+import shards
+
+VERSION = 1
+
+ALIASES = {
+    'hs': 'high school', 'ms': 'middle school', 'es': 'elementary school',
+    'jhs': 'junior high school', 'elem': 'elementary', 'sch': 'school', 'schl': 'school',
+    'acad': 'academy', 'ctr': 'center', 'cntr': 'center', 'co': 'county', 'cnty': 'county',
+    'st': 'saint', 'mt': 'mount', 'ft': 'fort', 'jr': 'junior', 'sr': 'senior', 'voc': 'vocational',
+}
+
+# Match quality per kind of token match, and the weight of a district / county match
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.6
+PLACE_WEIGHT = 0.5
+MIN_SIMILARITY = 0.5
+
+
+def normalize(text, aliases=ALIASES):
+    """Lowercase words with punctuation dropped and abbreviations expanded"""
+    text = text.lower().replace('&', ' and ').replace('.', '').replace("'", '')
+    words = []
+    for word in re.split(r'[^a-z0-9]+', text):
+        if word:
+            words.extend(aliases.get(word, word).split())
+    return words
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _postings(tokens_of, n):
+    """token -> sorted ids, for ids 0..n-1 and their token lists"""
+    postings = {}
+    for i in range(n):
+        for token in set(tokens_of(i)):
+            postings.setdefault(token, []).append(i)
+    return postings
+
+
+def build_index(schools):
+    """The JSON-serializable index for a list of school objects"""
+    docs = [[shard, s['school'], s['district'], s['county']]
+            for s, shard in zip(schools, shards.shard_ids(schools))]
+
+    place_docs = {}
+    for i, s in enumerate(schools):
+        for place in dict.fromkeys((s['district'], s['county'])):
+            place_docs.setdefault(place, []).append(i)
+    places = sorted(place_docs.items())
+
+    names = _postings(lambda i: normalize(docs[i][1]), len(docs))
+    place_ids = _postings(lambda i: normalize(places[i][0]), len(places))
+    tokens = sorted(set(names) | set(place_ids))
+
+    grams = {}
+    for t, token in enumerate(tokens):
+        for gram in trigrams(token):
+            grams.setdefault(gram, []).append(t)
+
+    return {
+        'version': VERSION,
+        'aliases': ALIASES,
+        'docs': docs,
+        'places': [[place, ids] for place, ids in places],
+        'tokens': tokens,
+        'names': [names.get(token, []) for token in tokens],
+        'place_ids': [place_ids.get(token, []) for token in tokens],
+        'trigrams': dict(sorted(grams.items())),
+    }
+
+
+def _intersect(per_word):
+    """Summed scores of the docs every word matched, rarest word first to keep it small"""
+    totals = None
+    for scores in sorted(per_word, key=len):
+        if totals is None:
+            totals = scores
+        else:
+            totals = {doc: total + scores[doc] for doc, total in totals.items() if doc in scores}
+        if not totals:
+            return {}
+    return totals or {}
+
+
+class SearchIndex:
+    def __init__(self, index):
+        self.aliases = index['aliases']
+        self.docs = index['docs']
+        self.places = index['places']
+        self.tokens = index['tokens']
+        self.names = index['names']
+        self.place_ids = index['place_ids']
+        self.trigrams = index['trigrams']
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _prefixed(self, prefix):
+        start = bisect_left(self.tokens, prefix)
+        stop = bisect_left(self.tokens, prefix + '\uffff', start)
+        return range(start, stop)
+
+    def _similar(self, word):
+        """
+        Token ids sharing enough trigrams with word (Dice coefficient), with
+        their edit similarity to it
+        """
+        grams = trigrams(word)
+        shared = {}
+        for gram in grams:
+            for t in self.trigrams.get(gram, ()):
+                shared[t] = shared.get(t, 0) + 1
+        found = []
+        for t, n in shared.items():
+            token = self.tokens[t]
+            if 2 * n / (len(grams) + len(trigrams(token))) >= MIN_SIMILARITY:
+                found.append((t, SequenceMatcher(None, word, token).ratio()))
+        return found
+
+    def matches(self, word, prefix=False):
+        """[(token id, quality)] for one query word"""
+        t = bisect_left(self.tokens, word)
+        if t < len(self.tokens) and self.tokens[t] == word:
+            found = [(t, EXACT)]
+        else:
+            found = []
+        if prefix:
+            found += [(p, PREFIX) for p in self._prefixed(word) if self.tokens[p] != word]
+        if found:
+            return found
+        return [(t, FUZZY * similarity) for t, similarity in self._similar(word)]
+
+    def _word_scores(self, word, prefix):
+        """doc id -> best score of one query word"""
+        scores = {}
+        for t, quality in self.matches(word, prefix):
+            for doc in self.names[t]:
+                if scores.get(doc, 0) < quality:
+                    scores[doc] = quality
+            place_quality = quality * PLACE_WEIGHT
+            for place in self.place_ids[t]:
+                for doc in self.places[place][1]:
+                    if scores.get(doc, 0) < place_quality:
+                        scores[doc] = place_quality
+        return scores
+
+    def _expanded_scores(self, word):
+        """
+        doc id -> score of a complete query word, its alias expanded; an
+        expansion's words must all match and are averaged, so it counts as one word
+        """
+        parts = self.aliases.get(word, word).split()
+        return {doc: total / len(parts)
+                for doc, total in _intersect([self._word_scores(part, prefix=False) for part in parts]).items()}
+
+    def search(self, query, limit=10):
+        """
+        Best schools for a typed query, as
+        {'id', 'school', 'district', 'county', 'score'} dicts
+        """
+        words = normalize(query, {})
+        if not words:
+            return []
+
+        per_word = [self._expanded_scores(word) for word in words[:-1]]
+        last = self._word_scores(words[-1], prefix=True)
+        if words[-1] in self.aliases:
+            for doc, score in self._expanded_scores(words[-1]).items():
+                if last.get(doc, 0) < score:
+                    last[doc] = score
+        per_word.append(last)
+
+        totals = _intersect(per_word)
+        if not totals:
+            return []
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], len(self.docs[item[0]][1]), item[0]))
+        return [dict(zip(('id', 'school', 'district', 'county'), self.docs[doc]), score=round(score, 3))
+                for doc, score in ranked[:limit]]
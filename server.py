@@ -0,0 +1,272 @@
+"""
+Small asyncio HTTP server for the built dataset.
+
+    python server.py --data tennessee-after-graduation-data.json --port 8000
+
+    GET /api/state                      state summary
+    GET /api/schools/<id>               one school (id = shard id; a plain slug finds the first match)
+    GET /api/counties                   counties with school counts
+    GET /api/counties/<county>          a county's schools in rank order
+    GET /api/tiers/<tier>               schools in a tier (elite, strong, ready, building, grow, na)
+    GET /api/improvers                  top improvers
+    GET /api/top?metric=&k=&county=&district=&tier=
+    GET /api/filter?county=&district=&tier=&min_<metric>=&max_<metric>=
+
+Fixed responses are serialized and compressed once at startup. Query
+responses go through a bounded LRU cache. gzip/brotli bodies are served
+to clients that accept them, and every response carries a strong ETag
+(a hash of its body, suffixed per content coding) and honours
+If-None-Match. Only GET and HEAD are
+supported; connections are kept alive.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import shards
+from flight_engine import TIER_KEYS
+from query import METRICS, SchoolIndex
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_CACHE_SIZE = 1024
+MAX_K = 500
+
+# Fields of the per-school rows in county / tier / query listings
+ROW_FIELDS = ['slug', 'school', 'district', 'county', 'flight_score', 'flight_tier', 'county_rank',
+              'county_total', 'is_top_county', 'latest', 'trend', 'content_hash']
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class Response:
+    """An encoded JSON body and its compressed variants, each with its own strong ETag"""
+
+    def __init__(self, data, status=200):
+        self.status = status
+        self.body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(self.body).hexdigest()[:20]
+        self.encoded = {'gzip': gzip.compress(self.body, compresslevel=6, mtime=0)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(self.body, quality=5)
+        self.etags = {None: f'"{digest}"', **{encoding: f'"{digest}-{encoding}"' for encoding in self.encoded}}
+
+    def variant(self, accept_encoding):
+        """(content-encoding or None, body) for an Accept-Encoding header"""
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and encoding in accepted:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+
+class LRUCache:
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        if key in self.items:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+        self.misses += 1
+        value = compute()
+        self.items[key] = value
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+        return value
+
+
+def school_row(school):
+    return {field: school.get(field) for field in ROW_FIELDS}
+
+
+class DatasetApp:
+    """Routes requests to precomputed or cached responses"""
+
+    def __init__(self, data, cache_size=DEFAULT_CACHE_SIZE):
+        self.index = SchoolIndex(data)
+        self.cache = LRUCache(cache_size)
+        self.not_found = Response({'error': 'not found'}, status=404)
+        self.routes = self._precompute(data)
+
+    @classmethod
+    def load(cls, path, cache_size=DEFAULT_CACHE_SIZE):
+        with open(path) as f:
+            return cls(json.load(f), cache_size)
+
+    def _precompute(self, data):
+        schools = data['schools']
+        routes = {
+            '/api/state': Response(data['state']),
+            '/api/improvers': Response(data['top_improvers']),
+        }
+
+        for school, shard in zip(schools, shards.shard_ids(schools)):
+            response = Response(school)
+            routes[f"/api/schools/{shard}"] = response
+            routes.setdefault(f"/api/schools/{school['slug']}", response)
+
+        counties = []
+        for county, members in sorted(self.index.counties.items()):
+            slug = shards.file_slug(county)
+            ranked = sorted((schools[i] for i in members),
+                            key=lambda s: (s['county_rank'] is None, s['county_rank'] or 0))
+            routes[f"/api/counties/{slug}"] = Response({'county': county, 'schools': [school_row(s) for s in ranked]})
+            counties.append({'county': county, 'slug': slug, 'schools_count': len(members)})
+        routes['/api/counties'] = Response({'counties': counties})
+
+        for tier in TIER_KEYS:
+            routes[f"/api/tiers/{tier}"] = Response({'tier': tier, 'schools': [school_row(s) for s in self.index.tier(tier)]})
+        return routes
+
+    def respond(self, path, query):
+        """Response for a GET path and its parsed query pairs"""
+        path = unquote(path).rstrip('/') or '/'
+        if path in self.routes:
+            return self.routes[path]
+        if path in ('/api/top', '/api/filter'):
+            params = tuple(sorted(query))
+            return self.cache.get((path, params), lambda: self._query(path, dict(params)))
+        return self.not_found
+
+    def _query(self, path, params):
+        try:
+            if path == '/api/top':
+                metric = params.get('metric', 'flight_score')
+                if metric not in METRICS:
+                    raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+                k = int(params.get('k', 10))
+                if k < 1:
+                    raise ValueError('k must be at least 1')
+                k = min(k, MAX_K)
+                found = self.index.top(metric, k, county=params.get('county'), district=params.get('district'),
+                                       tier=params.get('tier'), ascending=params.get('order') == 'asc')
+            else:
+                ranges = {}
+                for metric in METRICS:
+                    low, high = params.get(f"min_{metric}"), params.get(f"max_{metric}")
+                    if low is not None or high is not None:
+                        ranges[metric] = (None if low is None else float(low), None if high is None else float(high))
+                found = self.index.filter(county=params.get('county'), district=params.get('district'),
+                                          tier=params.get('tier'), **ranges)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({'count': len(found), 'schools': [school_row(s) for s in found]})
+
+
+def etag_matches(header, etag):
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def read_request(reader):
+    """(method, target, version, headers) or None at end of stream"""
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise ValueError('malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], parts[2], headers
+
+
+def render(status, headers, body=b''):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def handle(app, method, target, headers):
+    """Raw response bytes for one request"""
+    if method not in ('GET', 'HEAD'):
+        return render(405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+
+    url = urlsplit(target)
+    response = app.respond(url.path, parse_qsl(url.query))
+    encoding, body = response.variant(headers.get('accept-encoding', ''))
+    etag = response.etags[encoding]
+    common = [('ETag', etag), ('Vary', 'Accept-Encoding')]
+    if response.status == 200:
+        common.append(('Cache-Control', 'public, max-age=300'))
+
+    if response.status == 200 and etag_matches(headers.get('if-none-match'), etag):
+        return render(304, common + [('Content-Length', '0')])
+
+    out = common + [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+    if encoding:
+        out.append(('Content-Encoding', encoding))
+    return render(response.status, out, b'' if method == 'HEAD' else body)
+
+
+async def serve_connection(app, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError:
+                writer.write(render(400, [('Content-Length', '0'), ('Connection', 'close')]))
+                break
+            if request is None:
+                break
+            method, target, version, headers = request
+            writer.write(handle(app, method, target, headers))
+            await writer.drain()
+            connection = headers.get('connection', '').lower()
+            if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(app, host='127.0.0.1', port=8000):
+    return await asyncio.start_server(lambda r, w: serve_connection(app, r, w), host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the built dataset over HTTP')
+    parser.add_argument('--data', default='tennessee-after-graduation-data.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Query responses kept in the LRU cache')
+    args = parser.parse_args(argv)
+
+    app = DatasetApp.load(args.data, args.cache_size)
+    print(f"Serving {len(app.index)} schools, {len(app.routes)} precomputed responses "
+          f"on http://{args.host}:{args.port}/api/state")
+
+    async def run():
+        server = await start_server(app, args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Sharded, lazy-loadable copy of the after-graduation dataset.
+
+    index.json               meta, state summary, top improvers, one small
+                             row per school and the shard of every county
+    counties/<county>.json   every school in one county, full history
+    schools/<id>.json        one school, full history
+
+A school page needs index.json and one school shard instead of the whole
+monolithic file. Everything is written with compact separators, next to
+precompressed .gz (and .br when the brotli package is installed) siblings
+for servers that serve them directly. Files whose content hasn't changed
+are left untouched, and shards of schools or counties that disappeared are
+removed.
+"""
+import gzip
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INDEX_FILE = 'index.json'
+SEPARATORS = (',', ':')
+
+# Per-school fields copied into the index
+INDEX_FIELDS = ['slug', 'school', 'district', 'county', 'flight_score', 'flight_tier', 'flight_tier_class',
+                'county_rank', 'is_top_county', 'content_hash']
+
+
+def file_slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def county_file(county):
+    return file_slug(county) + '.json'
+
+
+def shard_ids(schools):
+    """
+    Shard id per school: its slug, or slug-system-school for names that
+    occur more than once (several 'Central High School's, ...)
+    """
+    counts = {}
+    for school in schools:
+        counts[school['slug']] = counts.get(school['slug'], 0) + 1
+    return [s['slug'] if counts[s['slug']] == 1 else f"{s['slug']}-{s['system_code']}-{s['school_code']}"
+            for s in schools]
+
+
+def encode(data):
+    return json.dumps(data, separators=SEPARATORS).encode('utf-8')
+
+
+def build_shards(output):
+    """{relative path: JSON-serializable data} for a built dataset"""
+    schools = output['schools']
+    ids = shard_ids(schools)
+
+    counties = {}
+    for school in schools:
+        counties.setdefault(school['county'], []).append(school)
+
+    index_rows = []
+    for school, shard in zip(schools, ids):
+        row = {field: school[field] for field in INDEX_FIELDS}
+        row['trend'] = school['trend']['direction']
+        row['change'] = school['trend']['change']
+        row['file'] = f"schools/{shard}.json"
+        index_rows.append(row)
+
+    files = {
+        INDEX_FILE: {
+            'meta': output['meta'],
+            'state': output['state'],
+            'top_improvers': output['top_improvers'],
+            'counties': {county: {'file': f"counties/{county_file(county)}", 'schools_count': len(members)}
+                         for county, members in sorted(counties.items())},
+            'schools': index_rows
+        }
+    }
+    for county, members in counties.items():
+        files[f"counties/{county_file(county)}"] = {'county': county, 'schools': members}
+    for school, shard in zip(schools, ids):
+        files[f"schools/{shard}.json"] = school
+    return files
+
+
+def _compressed(raw):
+    variants = {'': raw, '.gz': gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(raw, quality=11)
+    return variants
+
+
+def _write_if_changed(path, content):
+    if os.path.exists(path) and os.path.getsize(path) == len(content):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return True
+
+
+def write_compressed(path, data):
+    """
+    Write data as compact JSON plus its compressed siblings, skipping
+    unchanged files. Returns (files written, raw bytes, gzipped bytes).
+    """
+    variants = _compressed(encode(data))
+    written = sum(_write_if_changed(path + suffix, content) for suffix, content in variants.items())
+    return written, len(variants['']), len(variants['.gz'])
+
+
+def write_shards(output_dir, output):
+    """
+    Write the index and shards under output_dir.
+    Returns {'files', 'written', 'removed', 'bytes': {relative path: (raw, gz)}}
+    """
+    files = build_shards(output)
+    for sub in ('counties', 'schools'):
+        os.makedirs(os.path.join(output_dir, sub), exist_ok=True)
+
+    written = 0
+    sizes = {}
+    expected = set()
+    suffixes = ['', '.gz'] + (['.br'] if brotli is not None else [])
+    for relative, data in files.items():
+        count, raw, gz = write_compressed(os.path.join(output_dir, relative), data)
+        written += count
+        sizes[relative] = (raw, gz)
+        expected.update(relative + suffix for suffix in suffixes)
+
+    removed = 0
+    for sub in ('counties', 'schools'):
+        for name in os.listdir(os.path.join(output_dir, sub)):
+            if f"{sub}/{name}" not in expected:
+                os.remove(os.path.join(output_dir, sub, name))
+                removed += 1
+
+    return {'files': len(files), 'written': written, 'removed': removed, 'bytes': sizes}
@@ -0,0 +1,157 @@
+"""
+On-disk cache of parsed TDOE sheets.
+
+Parsing .xlsx with openpyxl is the slowest part of the build and the source
+files rarely change, so the output of each ingest loader is stored as
+Parquet keyed by the source file's content hash, the sheet name, the loader
+and ingest.LOADER_VERSION. A changed file or loader simply misses the cache;
+old entries are evicted least-recently-used once the cache exceeds its size
+limit. The counters the loader reported (rows read / kept, ...) are stored
+in a .counts.json sidecar and replayed on a hit, so build reports count the
+same rows warm or cold.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+
+import pandas as pd
+
+import ingest
+import instrument
+import streaming
+
+try:
+    import pyarrow  # noqa: F401
+    FORMAT = 'parquet'
+except ImportError:
+    FORMAT = 'pkl'
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sheet_cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+COUNTS_SUFFIX = '.counts.json'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SheetCache:
+    """
+    cache = SheetCache()
+    df = cache.load(path, ingest.load_act)
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True, streaming=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.streaming = streaming
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            self.prune()
+
+    def entry_path(self, path, loader, sheet_name=0):
+        sheet = re.sub(r'[^A-Za-z0-9]+', '_', str(sheet_name))
+        name = f"v{ingest.LOADER_VERSION}-{loader.__name__}-{sheet}-{file_hash(path)}.{FORMAT}"
+        return os.path.join(self.directory, name)
+
+    def load(self, path, loader, sheet_name=0):
+        """Return loader(read_excel(path, sheet_name)), from the cache when possible"""
+        if not self.enabled:
+            return self.parse(path, loader, sheet_name)
+
+        entry = self.entry_path(path, loader, sheet_name)
+        if os.path.exists(entry):
+            try:
+                df = self._read(entry)
+                counts = self._read_counts(entry)
+                os.utime(entry)
+                self.hits += 1
+                instrument.count(cache_hits=1, rows_cached=len(df), **counts)
+                return df
+            except Exception:
+                # Truncated or unreadable entry (or no counts), fall through and rebuild it
+                _remove(entry)
+                _remove(entry + COUNTS_SUFFIX)
+
+        self.misses += 1
+        instrument.count(cache_misses=1)
+        df, counts = instrument.counted(self.parse, path, loader, sheet_name)
+        self._write(df, counts, entry)
+        self.prune()
+        return df
+
+    def parse(self, path, loader, sheet_name=0):
+        if self.streaming:
+            return streaming.load(path, loader, sheet_name)
+        return loader(pd.read_excel(path, sheet_name=sheet_name))
+
+    def _read(self, entry):
+        if FORMAT == 'parquet':
+            return pd.read_parquet(entry)
+        with open(entry, 'rb') as f:
+            return pickle.load(f)
+
+    def _read_counts(self, entry):
+        with open(entry + COUNTS_SUFFIX) as f:
+            return json.load(f)
+
+    def _write(self, df, counts, entry):
+        # The sidecar goes first, so an entry never exists without its counts
+        tmp = entry + COUNTS_SUFFIX + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(counts, f)
+        os.replace(tmp, entry + COUNTS_SUFFIX)
+
+        tmp = entry + '.tmp'
+        if FORMAT == 'parquet':
+            df.to_parquet(tmp, index=False)
+        else:
+            with open(tmp, 'wb') as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+
+    def prune(self):
+        """
+        Drop entries from older loader versions, then evict LRU entries over
+        max_bytes. Pool workers prune concurrently, so an entry another
+        process already removed is skipped.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            full = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                continue
+            if not name.startswith(f"v{ingest.LOADER_VERSION}-"):
+                _remove(full)
+                continue
+            if name.endswith(COUNTS_SUFFIX):
+                continue
+            try:
+                stat = os.stat(full)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, full))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(full)
+            _remove(full + COUNTS_SUFFIX)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,228 @@
+"""
+Append-only store of per-build snapshots, for history across TDOE releases.
+
+Every build appends one partition with a row per school:
+
+    .snapshots/
+        builds.json                        one entry per build, oldest first
+        build=20250301T120000Z-1a2b3c4d/
+            schools.parquet                key, slug, names, flight score,
+                                           tier, ranks, latest metrics, ...
+
+Rows are keyed by school (`key`, the system-school code pair) and build.
+A build whose dataset hash equals the latest snapshot's adds nothing.
+Partitions are never rewritten, and one only counts once it is listed in
+builds.json, so an interrupted write is ignored.
+
+Queries prune partitions through builds.json and read only the columns
+they need; with Parquet, slug lookups are pushed down to the reader too:
+
+    store = SnapshotStore()
+    store.history('franklin-high-school')     flight score / tier per build
+    store.tier_changes()                      schools whose tier moved between the last two builds
+
+    python snapshots.py history franklin-high-school
+    python snapshots.py tier-changes --before 20250301T120000Z-1a2b3c4d
+
+Without pyarrow, partitions are pickled DataFrames and filtered after loading.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+import delta
+import ranking
+from query import LATEST_METRICS, tier_key
+
+try:
+    import pyarrow  # noqa: F401
+    FORMAT = 'parquet'
+except ImportError:
+    FORMAT = 'pkl'
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.snapshots')
+MANIFEST_FILE = 'builds.json'
+PARTITION_FILE = f"schools.{FORMAT}"
+
+HISTORY_COLUMNS = ['school', 'county', 'flight_score', 'tier', 'county_rank', 'state_rank']
+
+
+def snapshot_frame(output):
+    """
+    One row per school of a built dataset, sorted by slug. The state rank
+    isn't in the records, so it is recomputed from the flight scores in the
+    output's (ranking) order.
+    """
+    schools = output['schools']
+    scores = np.array([np.nan if s['flight_score'] is None else s['flight_score'] for s in schools], dtype=np.float64)
+    state_rank = ranking.group_ranks(scores, np.zeros(len(scores), dtype=np.int64))[0]
+    frame = pd.DataFrame({
+        'key': [f"{s['system_code']}-{s['school_code']}" for s in schools],
+        'slug': [s['slug'] for s in schools],
+        'school': [s['school'] for s in schools],
+        'district': [s['district'] for s in schools],
+        'county': [s['county'] for s in schools],
+        'flight_score': scores,
+        'tier': [tier_key(s) for s in schools],
+        'county_rank': pd.array([s.get('county_rank') for s in schools], dtype='Int64'),
+        'state_rank': pd.array([rank or None for rank in state_rank.tolist()], dtype='Int64'),
+        **{metric: np.array([np.nan if s['latest'][metric] is None else s['latest'][metric] for s in schools],
+                            dtype=np.float64) for metric in LATEST_METRICS},
+        'rg_change': np.array([np.nan if s['trend']['change'] is None else s['trend']['change'] for s in schools],
+                              dtype=np.float64),
+        'content_hash': [s.get(delta.HASH_FIELD) or delta.content_hash(s) for s in schools],
+    })
+    return frame.sort_values('slug', kind='stable').reset_index(drop=True)
+
+
+class SnapshotStore:
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+
+    # ---------- layout ----------
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def partition_path(self, build):
+        return os.path.join(self.directory, f"build={build}", PARTITION_FILE)
+
+    def builds(self):
+        """Manifest entries, oldest first"""
+        path = self.manifest_path()
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)['builds']
+
+    # ---------- writing ----------
+    def append(self, output, created=None):
+        """
+        Snapshot a built dataset. Returns its manifest entry, or None when
+        the dataset is unchanged since the latest snapshot.
+        """
+        builds = self.builds()
+        dataset_hash = delta.dataset_hash(output)
+        if builds and builds[-1]['dataset_hash'] == dataset_hash:
+            return None
+
+        created = time.gmtime() if created is None else created
+        build = f"{time.strftime('%Y%m%dT%H%M%SZ', created)}-{dataset_hash[:8]}"
+        frame = snapshot_frame(output)
+        path = self.partition_path(build)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        if FORMAT == 'parquet':
+            frame.to_parquet(tmp, index=False)
+        else:
+            with open(tmp, 'wb') as f:
+                pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        entry = {
+            'build': build,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', created),
+            'dataset_hash': dataset_hash,
+            'updated': output['meta'].get('updated'),
+            'schools': len(frame),
+            'bytes': os.path.getsize(path)
+        }
+        tmp = self.manifest_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'format': FORMAT, 'builds': builds + [entry]}, f, indent=2)
+        os.replace(tmp, self.manifest_path())
+        return entry
+
+    # ---------- reading ----------
+    def _select(self, builds=None, since=None, until=None):
+        """Build ids to read, oldest first: `builds`, or the [since, until] span"""
+        ids = [entry['build'] for entry in self.builds()]
+        if builds is not None:
+            wanted = set(builds)
+            return [build for build in ids if build in wanted]
+        if since is not None:
+            ids = ids[ids.index(since):]
+        if until is not None:
+            ids = ids[:ids.index(until) + 1]
+        return ids
+
+    def _read_partition(self, build, columns, slug=None):
+        path = self.partition_path(build)
+        if FORMAT == 'parquet':
+            filters = None if slug is None else [('slug', '==', slug)]
+            return pd.read_parquet(path, columns=columns, filters=filters)
+        with open(path, 'rb') as f:
+            frame = pickle.load(f)
+        if slug is not None:
+            frame = frame[frame['slug'] == slug]
+        return frame[columns]
+
+    def read(self, columns, builds=None, since=None, until=None, slug=None):
+        """
+        Rows of the selected builds (all by default) with just `columns`
+        plus 'build' and 'key', oldest build first
+        """
+        columns = list(dict.fromkeys(['key'] + list(columns)))
+        frames = []
+        for build in self._select(builds, since, until):
+            frame = self._read_partition(build, columns, slug)
+            frame.insert(0, 'build', build)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['build'] + columns)
+        return pd.concat(frames, ignore_index=True)
+
+    # ---------- queries ----------
+    def history(self, slug, columns=HISTORY_COLUMNS, **span):
+        """One row per build that has a school with this slug"""
+        return self.read(['slug'] + list(columns), slug=slug, **span).drop(columns='slug')
+
+    def tier_changes(self, before=None, after=None):
+        """
+        Schools whose tier differs between two builds (default: the last
+        two), with their scores in both
+        """
+        if before is None or after is None:
+            ids = self._select()
+            if len(ids) < 2:
+                return pd.DataFrame(columns=['key', 'slug', 'school', 'county', 'tier_before', 'tier_after',
+                                             'score_before', 'score_after'])
+            before, after = before or ids[-2], after or ids[-1]
+        columns = ['slug', 'school', 'county', 'tier', 'flight_score']
+        old = self.read(['tier', 'flight_score'], builds=[before]).drop(columns='build')
+        new = self.read(columns, builds=[after]).drop(columns='build')
+        merged = new.merge(old, on='key', suffixes=('_after', '_before'))
+        changed = merged[merged['tier_before'] != merged['tier_after']]
+        return changed.rename(columns={'flight_score_before': 'score_before', 'flight_score_after': 'score_after'})[
+            ['key', 'slug', 'school', 'county', 'tier_before', 'tier_after', 'score_before', 'score_after']
+        ].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the per-build snapshot store')
+    parser.add_argument('--dir', default=DEFAULT_DIR, help='Snapshot store folder')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('builds', help='List the snapshotted builds')
+    history = commands.add_parser('history', help='Flight score, tier and ranks of a school per build')
+    history.add_argument('slug')
+    changes = commands.add_parser('tier-changes', help='Schools whose tier changed between two builds')
+    changes.add_argument('--before', help='Build id (default: second to last)')
+    changes.add_argument('--after', help='Build id (default: last)')
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    if args.command == 'builds':
+        for entry in store.builds():
+            print(f"{entry['build']}  {entry['schools']} schools  {entry['bytes']:,} bytes  (data {entry['updated']})")
+    elif args.command == 'history':
+        print(store.history(args.slug).to_string(index=False))
+    else:
+        print(store.tier_changes(args.before, args.after).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Bounded-memory streaming ingestion (--streaming).
+
+pd.read_excel materializes every cell of a sheet before the loaders look
+at it. Here the sheet is read with openpyxl in read-only mode and each row
+goes through a chain of generators as it arrives:
+
+    read -> select (only the columns the loader uses) -> filter (blank rows,
+    rows without school codes) -> coerce (suppression markers -> NaN) ->
+    key -> aggregate
+
+The aggregator keeps only the reduced rows: names and groups are interned,
+codes and metrics stored in typed arrays, and a later row for the same
+school and group replaces the earlier one as it arrives. Memory therefore
+grows with the schools kept rather than the size of the workbook.
+
+The result is exactly the frame the DataFrame loader returns, so the sheet
+cache and everything downstream don't know which reader was used.
+"""
+from array import array
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import ingest
+
+NAN = float('nan')
+
+
+def read_rows(path, sheet_name=0):
+    """Value tuples of one sheet, header first, streamed from a read-only workbook"""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def to_number(value):
+    """One cell as pd.to_numeric(errors='coerce') would read it"""
+    if value is None or isinstance(value, bool):
+        return NAN
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def select(rows, header, columns):
+    """Just `columns` of every non-blank row (None for columns the sheet lacks)"""
+    positions = [header.index(col) if col in header else None for col in columns]
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        yield tuple(row[p] if p is not None and p < len(row) else None for p in positions)
+
+
+def with_codes(rows):
+    """Rows whose system and school codes are numeric, codes coerced"""
+    for system, school, *rest in rows:
+        system, school = to_number(system), to_number(school)
+        if system == system and school == school:
+            yield (int(system), int(school), *rest)
+
+
+def coerce(rows, n_fields):
+    """Trailing metric cells to floats, suppressed cells to NaN"""
+    for row in rows:
+        head, values = row[:-n_fields], row[-n_fields:]
+        yield head, [to_number(value) for value in values]
+
+
+def keyed(rows):
+    for (system, school, district, name, group), values in rows:
+        yield (f"{system}-{school}", group), (system, school, district, name), values
+
+
+class SchoolRows:
+    """
+    Compact accumulator for keyed school rows. A repeated (key, group)
+    drops the earlier row, matching drop_duplicates(keep='last').
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.keys = []
+        self.groups = array('i')
+        self.system_codes = array('q')
+        self.school_codes = array('q')
+        self.districts = array('i')
+        self.schools = array('i')
+        self.values = [array('d') for _ in self.fields]
+        self.alive = bytearray()
+        self.positions = {}
+        self.strings = {}
+        self.rows_read = 0
+
+    def intern(self, value):
+        if value is None:
+            return -1
+        return self.strings.setdefault(value, len(self.strings))
+
+    def add(self, rows):
+        for (key, group), (system, school, district, name), values in rows:
+            position = self.positions.get((key, group))
+            if position is not None:
+                self.alive[position] = 0
+            self.positions[(key, group)] = len(self.keys)
+            self.keys.append(key)
+            self.groups.append(self.intern(group))
+            self.system_codes.append(system)
+            self.school_codes.append(school)
+            self.districts.append(self.intern(district))
+            self.schools.append(self.intern(name))
+            for column, value in zip(self.values, values):
+                column.append(value)
+            self.alive.append(1)
+        return self
+
+    def frame(self):
+        keep = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        table = np.array(list(self.strings) + [None], dtype=object)
+
+        def strings(ids):
+            return table[np.frombuffer(ids, dtype=np.int32)[keep]]
+
+        frame = pd.DataFrame({
+            'key': np.array(self.keys, dtype=object)[keep],
+            'group': strings(self.groups),
+            'system_code': np.frombuffer(self.system_codes, dtype=np.int64)[keep],
+            'district': strings(self.districts),
+            'school_code': np.frombuffer(self.school_codes, dtype=np.int64)[keep],
+            'school': strings(self.schools),
+        })
+        for field, column in zip(self.fields, self.values):
+            frame[field] = np.frombuffer(column, dtype=np.float64)[keep]
+        return frame
+
+
+def counted(rows, table):
+    for row in rows:
+        table.rows_read += 1
+        yield row
+
+
+def load_schools(rows, group_col, codes, fields):
+    """Streaming ingest._load: one row per (school, group) with every group kept"""
+    header = next(rows, ())
+    system, district, school, name = codes
+    sources = [ingest.source_column(header, field, source) for field, source in fields.items()]
+
+    table = SchoolRows(fields)
+    selected = select(rows, header, [system, school, district, name, group_col] + sources)
+    table.add(keyed(coerce(with_codes(counted(selected, table)), len(sources))))
+    return ingest.finish_schools(table.frame(), fields, table.rows_read)
+
+
+def load_cgr(rows):
+    """Streaming ingest.load_cgr: only the columns it reads are kept"""
+    header = next(rows, ())
+    columns = [col for col in ingest.CGR_COLUMNS if col in header]
+    kept = {col: [] for col in columns}
+    for row in select(rows, header, columns):
+        for col, value in zip(columns, row):
+            kept[col].append(NAN if value is None else value)
+    return ingest.load_cgr(pd.DataFrame(kept, columns=columns))
+
+
+def load(path, loader, sheet_name=0):
+    """Same result as loader(pd.read_excel(path, sheet_name=sheet_name)), streamed"""
+    rows = read_rows(path, sheet_name)
+    if loader.__name__ in ingest.SCHOOL_LAYOUTS:
+        return load_schools(rows, *ingest.SCHOOL_LAYOUTS[loader.__name__])
+    if loader.__name__ == 'load_cgr':
+        return load_cgr(rows)
+    raise ValueError(f"No streaming reader for {loader.__name__}")